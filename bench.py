@@ -0,0 +1,280 @@
+# ===========================================
+# - Frame-time benchmark for main.py, old.py and practice.py
+# - Runs each scene under SDL's dummy video driver with an uncapped clock
+#   and reports p50/p95/p99 per phase: update, trails, draw, text, flip
+#
+#   python bench.py --frames 300 --bodies 10 100 1000 --trail 300 3000 --json bench.json
+# ===========================================
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from trail import OrbitHistory
+
+PHASES = ("update", "trails", "draw", "text", "flip")
+SCENES = ("main", "old", "practice")
+
+
+class TychoScene:
+    # main.py: the geocentric system plus extra trailed bodies
+    def __init__(self, bodies, trail, pan):
+        import main
+        import tycho
+        from trail import TrailBuffer
+        main.init()
+        self.m = main
+        self.system, self.bodies = tycho.solar_system(body_cls=main.Body)
+        rng = np.random.default_rng(0)
+        for i in range(max(0, bodies - len(self.bodies))):
+            self.bodies.append(main.Body(f"Body {i}", (150, 150, 150), rng.uniform(0.2, 3.0),
+                                         rng.uniform(0, 2 * np.pi), 2, rng.uniform(80, 400),
+                                         system=self.system, trail_length=trail))
+        for b in self.bodies:
+            b.trail = TrailBuffer(trail) if b.trail.capacity != trail else b.trail
+        # prefill every trail from the closed form instead of stepping
+        dt = 1 / 60
+        history = self.system.positions_at(dt * np.arange(-trail + 1, 1)).astype(np.float32)
+        for b in self.bodies:
+            b.trail.extend(history[:, b.index])
+        self.dt = dt
+        self.pan = pan
+        self.ox = 0
+
+    def update(self):
+        self.system.update(self.dt)
+
+    def trails(self):
+        m = self.m
+        if self.pan:
+            self.ox += 1
+        m.camera.set_view(m.Body.SCALE, self.ox, 0)
+        m.renderer.begin((m.camera.version, True))
+        # the trail layer, as main.draw_scene draws it; labels are timed under text
+        for b in self.bodies:
+            b.draw(m.screen, self.ox, 0, True, False)
+
+    def draw(self):
+        m = self.m
+        m.draw_earth(m.screen, self.ox, 0, False)
+        m.draw_bodies(self.bodies, self.system.world)
+        m.renderer.flush()
+
+    def text(self, frame):
+        m = self.m
+        for b in self.bodies:
+            pos = m.camera.point_to_screen(*b.world)
+            m.renderer.mark(m.screen.blit(m.render_text(m.FONT, b.label, m.COLOR_WHITE), pos))
+        m.renderer.mark(m.screen.blit(m.render_text(m.FONT, f"Frame: {frame}", m.COLOR_WHITE), (10, 10)))
+
+    def flip(self):
+        self.m.renderer.end()
+
+
+class NBodyScene:
+    # old.py: the solar system plus light asteroids on circular orbits
+    def __init__(self, bodies, trail, pan):
+        import nbody
+        import old
+        old.init()
+        self.m = old
+        self.nbody = nbody
+        self.planets = nbody.solar_system(old.Planet)
+        rng = np.random.default_rng(0)
+        sun = self.planets[-1]
+        for _ in range(max(0, bodies - len(self.planets))):
+            r = rng.uniform(0.3, 5.0) * old.Planet.AU
+            a = rng.uniform(0, 2 * np.pi)
+            p = old.Planet(r * np.cos(a), r * np.sin(a), 1, (150, 150, 150), 1e15)
+            v = np.sqrt(old.Planet.G * sun.mass / r)
+            p.x_vel, p.y_vel = -v * np.sin(a), v * np.cos(a)
+            self.planets.append(p)
+        # synthetic circular history of the requested length
+        for p in self.planets:
+            r = np.hypot(p.x, p.y)
+            a0 = np.arctan2(p.y, p.x)
+            w = np.hypot(p.x_vel, p.y_vel) / r if r else 0.0
+            a = a0 - w * old.Planet.TIMESTEP * np.arange(trail)[::-1]
+            p.orbit = OrbitHistory(trail)
+            p.orbit.extend(np.stack([r * np.cos(a), r * np.sin(a)], axis=1))
+        self.pan = pan
+        self.move_x = 0
+
+    def update(self):
+        self.nbody.step(self.planets)
+
+    def trails(self):
+        m = self.m
+        if self.pan:
+            self.move_x += 1
+        m.renderer.begin((m.Planet.SCALE, self.move_x, 0, True))
+        for p in self.planets:
+            p.draw_orbit(m.WINDOW, self.move_x, 0)
+
+    def draw(self):
+        self.m.draw_planets(self.planets, np.array([(p.x, p.y) for p in self.planets]), self.move_x, 0)
+        for p in self.planets:
+            p.draw(self.m.WINDOW, self.move_x, 0, False)
+        self.m.renderer.flush()
+
+    def text(self, frame):
+        m = self.m
+        m.renderer.mark(m.WINDOW.blit(m.render_text(m.FONT_1, f"Frame: {frame}", m.COLOR_WHITE), (15, 15)))
+
+    def flip(self):
+        self.m.renderer.end()
+
+
+class EpicycleScene:
+    # practice.py: the sun and Venus plus extra epicycle planets
+    def __init__(self, bodies, trail, pan):
+        import epicycles
+        import practice
+        practice.init()
+        self.m = practice
+        P = practice.PlanetAndEpicycles
+        self.planets = [P(practice.COLOR_SUN, 0.001, 0, 20, 0, True), P(practice.COLOR_VENUS, 6, 20, 5, 30, False)]
+        rng = np.random.default_rng(0)
+        for _ in range(max(0, bodies - len(self.planets))):
+            self.planets.append(P((150, 150, 150), rng.uniform(1, 8), rng.uniform(0, 6.28), 2,
+                                  rng.uniform(10, 150), False))
+        self.dt = 1 / 60
+        self.time = trail * self.dt
+        history = epicycles.positions_at(self.planets, self.dt * np.arange(trail))
+        for i, p in enumerate(self.planets):
+            p.orbit = OrbitHistory(trail)
+            p.orbit.extend(history[:, i])
+        self.pan = pan
+        self.move_x = 0
+
+    def update(self):
+        self.time += self.dt
+        for p in self.planets:
+            p.update_position(self.time)
+
+    def trails(self):
+        m = self.m
+        if self.pan:
+            self.move_x += 1
+        m.renderer.begin((m.PlanetAndEpicycles.SCALE, self.move_x, 0, True))
+        for p in self.planets:
+            p.draw_orbit(m.WINDOW, self.move_x, 0)
+
+    def draw(self):
+        m = self.m
+        m.draw_earth(m.WINDOW, self.move_x, 0)
+        for p in self.planets:
+            p.draw(m.WINDOW, self.move_x, 0, False)
+        m.renderer.flush()
+
+    def text(self, frame):
+        m = self.m
+        m.renderer.mark(m.WINDOW.blit(m.render_text(m.FONT_1, f"Frame: {frame}", m.COLOR_WHITE), (15, 15)))
+
+    def flip(self):
+        self.m.renderer.end()
+
+
+SCENE_CLASSES = {"main": TychoScene, "old": NBodyScene, "practice": EpicycleScene}
+
+
+def run_case(scene, bodies, trail, pan, frames, warmup):
+    """Time every phase of `frames` frames of one scene; runs in its own process."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+
+    s = SCENE_CLASSES[scene](bodies, trail, pan)
+    times = {phase: [] for phase in PHASES}
+    clock = time.perf_counter
+    start = clock()
+    for frame in range(warmup + frames):
+        pygame.event.pump()
+        t0 = clock()
+        s.update()
+        t1 = clock()
+        s.trails()
+        t2 = clock()
+        s.draw()
+        t3 = clock()
+        s.text(frame)
+        t4 = clock()
+        s.flip()
+        t5 = clock()
+        if frame == warmup - 1:
+            start = t5
+        if frame >= warmup:
+            for phase, dt in zip(PHASES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+                times[phase].append(dt)
+    total = clock() - start
+    pygame.quit()
+    result = {"scene": scene, "bodies": bodies, "trail": trail, "pan": pan, "frames": frames,
+              "fps": frames / total, "phases": {}}
+    for phase, samples in times.items():
+        ms = np.array(samples) * 1000
+        result["phases"][phase] = {"mean": float(ms.mean()),
+                                   **{f"p{q}": float(np.percentile(ms, q)) for q in (50, 95, 99)}}
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame-time benchmark for the three simulations")
+    parser.add_argument("--scenes", nargs="+", choices=SCENES, default=list(SCENES))
+    parser.add_argument("--bodies", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--trail", type=int, nargs="+", default=[300, 3000])
+    parser.add_argument("--pan", choices=["off", "on", "both"], default="both",
+                        help="move the camera every frame (forces full redraws)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--case", help=argparse.SUPPRESS)  # internal: run one case, print JSON
+    args = parser.parse_args()
+
+    if args.case:
+        scene, bodies, trail, pan = args.case.split(",")
+        print(json.dumps(run_case(scene, int(bodies), int(trail), pan == "1", args.frames, args.warmup)))
+        return
+
+    pans = {"off": [False], "on": [True], "both": [False, True]}[args.pan]
+    results = []
+    print(f"{'scene':<9} {'bodies':>6} {'trail':>6} {'pan':>4} {'fps':>8}  "
+          + "  ".join(f"{p + ' p50/p95/p99 ms':>26}" for p in PHASES))
+    for scene in args.scenes:
+        for bodies in args.bodies:
+            for trail in args.trail:
+                for pan in pans:
+                    # every case gets a fresh process: each script opens its own display
+                    case = f"{scene},{bodies},{trail},{int(pan)}"
+                    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", case,
+                                          "--frames", str(args.frames), "--warmup", str(args.warmup)],
+                                         capture_output=True, text=True, check=True).stdout
+                    r = json.loads(out.strip().splitlines()[-1])
+                    results.append(r)
+                    cells = "  ".join(f"{r['phases'][p]['p50']:>8.3f}/{r['phases'][p]['p95']:>8.3f}/"
+                                      f"{r['phases'][p]['p99']:>8.3f}" for p in PHASES)
+                    print(f"{scene:<9} {bodies:>6} {trail:>6} {'on' if pan else 'off':>4} {r['fps']:>8.1f}  {cells}")
+
+    if args.json:
+        import pygame
+        meta = {"commit": _git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+                "pygame": pygame.version.ver, "platform": platform.platform(),
+                "frames": args.frames, "warmup": args.warmup}
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
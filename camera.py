@@ -0,0 +1,37 @@
+# ===========================================
+# - Camera / viewport for world -> screen projection
+# ===========================================
+
+import numpy as np
+
+
+class Camera:
+    """World-to-screen transform: screen = world * scale + center + offset."""
+
+    def __init__(self, center_x, center_y, scale=1.0):
+        self.center_x = center_x
+        self.center_y = center_y
+        self.scale = scale
+        self.ox = 0
+        self.oy = 0
+        self.version = 0  # bumped whenever pan or zoom changes
+
+    def set_view(self, scale, ox, oy):
+        if (scale, ox, oy) != (self.scale, self.ox, self.oy):
+            self.scale, self.ox, self.oy = scale, ox, oy
+            self.version += 1
+
+    @property
+    def offset(self):
+        return (self.center_x + self.ox, self.center_y + self.oy)
+
+    def to_screen(self, pts):
+        # (n, 2) world points -> float64 screen points
+        out = np.multiply(pts, self.scale, dtype=float)
+        out += self.offset
+        return out
+
+    def point_to_screen(self, wx, wy):
+        return (int(self.center_x + wx * self.scale + self.ox),
+                int(self.center_y + wy * self.scale + self.oy))
+
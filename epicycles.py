@@ -0,0 +1,112 @@
+# ===========================================
+# - Epicycle model from practice.py: kinematics only
+# - No pygame here, so it can run headless
+# ===========================================
+
+import math
+
+import numpy as np
+
+from trail import OrbitHistory
+
+# Don't need to divide these by 2, it already accounts for it
+WIDTH, HEIGHT = 400, 400
+
+EARTH_POSITION = WIDTH/2, HEIGHT/2
+SUN_DISTANCE_FROM_EARTH = 200
+
+# Definite circulator 
+# Ellipse travel certain angle per time
+# 1 Year timeline 
+
+# Each planet need mass, 
+# k = speed
+# a = time variable
+
+def sun_position(radius, orbit_speed, time, init_angle):
+    sc = PlanetAndEpicycles.SCALE
+    x = WIDTH + sc*SUN_DISTANCE_FROM_EARTH*(math.cos(time) + radius*(math.cos(orbit_speed * time + init_angle)))
+    y = HEIGHT + sc*SUN_DISTANCE_FROM_EARTH*(math.sin(time) + radius*(math.sin(orbit_speed * time + init_angle)))
+
+    PlanetAndEpicycles.sun_x = x
+    PlanetAndEpicycles.sun_y = y
+
+    return x, y
+
+def planet_position(orbit_speed, time, init_angle, distance_from_sun):
+    sun_x, sun_y = PlanetAndEpicycles.sun_x, PlanetAndEpicycles.sun_y
+    sc = PlanetAndEpicycles.SCALE
+
+    x = sun_x + sc*distance_from_sun * math.cos(orbit_speed * time + init_angle)
+    y = sun_y + sc*distance_from_sun * math.sin(orbit_speed * time + init_angle)
+
+    return x, y
+
+class PlanetAndEpicycles: 
+    AU = 149.6e6 * 1000  # Astronomical unit to km
+    G = 6.67428e-11  # Gravitational constant
+    TIMESTEP = 60 * 60 * 24 * 2  # Seconds in 2 days
+    #SCALE = 200 / AU
+    SCALE = 1
+
+    sun_x = 0
+    sun_y = 0
+    # Orbit retention (see trail.OrbitHistory): the newest 3000 points in
+    # full, then two levels each 2x sparser
+    ORBIT_HISTORY = {'max_points': 3000, 'levels': 3, 'factor': 2}
+
+    def __init__(self, color, orbit_speed, init_angle, radius, distance_from_sun, is_sun):
+        self.x = WIDTH  # Initialize at center
+        self.y = HEIGHT
+        self.orbit = OrbitHistory(**self.ORBIT_HISTORY)
+        self.orbit_speed = orbit_speed
+        self.init_angle = init_angle
+        self.time = 0
+        self.radius = radius
+        self.color = color
+        self.is_sun = is_sun
+        self.sun_x = WIDTH
+        self.sun_y = HEIGHT
+        self.distance_from_sun = distance_from_sun
+
+    def move(self):
+        # Recompute the position from the current time
+        if self.is_sun:
+            # Sun orbits around Earth
+            self.x, self.y = sun_position(0, self.orbit_speed, self.time, self.init_angle)
+        else:
+            # Other planets orbit around Sun
+            # Then calculate planet's position relative to Sun
+            self.x, self.y = planet_position(self.orbit_speed, self.time, self.init_angle, self.distance_from_sun)
+
+    def update_position(self, time):
+        self.time = time  # Update the time property
+        # So it doesn't count starting point?
+        self.orbit.append((self.x, self.y), time)
+
+    def update_scale(self, scale):
+        self.radius *= scale
+
+
+def positions_at(planets, t):
+    """Closed-form positions of every planet at time t (scalar or array).
+
+    Same formulas as sun_position/planet_position, evaluated for all planets
+    and times at once: returns (n, 2) for a scalar t or (T, n, 2) for T times.
+    Planets ride on the first sun in the list.
+    """
+    t = np.asarray(t, dtype=float)[..., np.newaxis]
+    sc = PlanetAndEpicycles.SCALE
+    speed = np.array([p.orbit_speed for p in planets], dtype=float)
+    phase = speed * t + np.array([p.init_angle for p in planets], dtype=float)
+    sun = [p.is_sun for p in planets].index(True)
+    # the sun's epicycle radius is 0 in practice.py, so only its deferent remains
+    sun_x = WIDTH + sc * SUN_DISTANCE_FROM_EARTH * np.cos(t[..., 0])
+    sun_y = HEIGHT + sc * SUN_DISTANCE_FROM_EARTH * np.sin(t[..., 0])
+    dist = np.array([0 if p.is_sun else p.distance_from_sun for p in planets], dtype=float)
+    x = sun_x[..., np.newaxis] + sc * dist * np.cos(phase)
+    y = sun_y[..., np.newaxis] + sc * dist * np.sin(phase)
+    pos = np.stack([x, y], axis=-1)
+    pos[..., sun, 0] = sun_x
+    pos[..., sun, 1] = sun_y
+    return pos
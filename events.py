@@ -0,0 +1,240 @@
+# ===========================================
+# - Apparent-motion events of main.py's model, as seen from Earth:
+#   conjunctions with the sun, oppositions, and the stations where
+#   retrograde loops start and end
+# - Found as sign changes on a time grid over the closed form, refined
+#   by bisection for all of a body's brackets at once, and cached per scene
+#
+#   python events.py --years 1000
+#   python events.py --scene scenes/tycho.toml --years 5000 --list Mars
+# ===========================================
+
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+
+import tycho
+
+CONJUNCTION, OPPOSITION, RETROGRADE_START, RETROGRADE_END = range(4)
+EVENT_NAMES = ("conjunction", "opposition", "retrograde start", "retrograde end")
+EVENT_DTYPE = np.dtype([('t', '<f8'), ('body', '<i4'), ('event', 'i1')])
+
+SAMPLES_PER_TURN = 64  # grid points per turn of the fastest apparent motion
+CHUNK = 65536          # grid points evaluated at once
+CACHE_VERSION = 1
+
+# results of scan(), by system parameters and scan settings
+_cache = {}
+
+
+def _wrap(angle):
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def _signals(pos, vel, sun):
+    """(..., k, 3) functions whose zeros are the events of k bodies, from Earth-centred (..., k, 2) state.
+
+    0: elongation from the sun (zero at conjunction), 1: elongation from the
+    anti-sun (zero at opposition), 2: apparent angular velocity, signed so
+    that it's positive while the body moves the same way as the sun.
+    """
+    x, y = pos[..., 0], pos[..., 1]
+    lon = np.arctan2(y, x)
+    rate = (x * vel[..., 1] - y * vel[..., 0]) / (x * x + y * y)
+    elong = _wrap(lon - lon[..., sun, np.newaxis])
+    prograde = np.where(rate[..., sun] < 0, -1.0, 1.0)[..., np.newaxis]
+    return np.stack([elong, _wrap(elong - np.pi), rate * prograde], axis=-1)
+
+
+def _brackets(f):
+    """(i, body, signal) of every sign change of (T, k, 3) f between samples i and i + 1.
+
+    The two elongations also jump between -pi and pi; those jumps aren't zeros.
+    """
+    a, b = f[:-1], f[1:]
+    change = np.signbit(a) != np.signbit(b)
+    change[..., :2] &= (np.abs(a[..., :2]) < np.pi / 2) & (np.abs(b[..., :2]) < np.pi / 2)
+    return np.nonzero(change)
+
+
+def _events(t, body, signal, before):
+    # event codes from the signal that changed sign and its value before the change
+    event = np.where(signal == 0, CONJUNCTION, OPPOSITION)
+    retro = np.where(before > 0, RETROGRADE_START, RETROGRADE_END)
+    out = np.empty(len(t), EVENT_DTYPE)
+    out['t'] = t
+    out['body'] = body
+    out['event'] = np.where(signal == 2, retro, event)
+    return out
+
+
+def _refine(system, slots, lo, hi, signal, tol):
+    # bisect the brackets of one body together, each on its own signal;
+    # slots is [body, sun], so only those two are placed per step
+    def at(t):
+        f = _signals(system.positions_at(t, slots), system.velocities_at(t, slots), 1)
+        return f[np.arange(len(t)), 0, signal]
+    f_lo = at(lo)
+    before = f_lo.copy()
+    while len(lo) and (hi - lo).max() > tol:
+        mid = (lo + hi) / 2
+        f = at(mid)
+        same = np.signbit(f) == np.signbit(f_lo)
+        lo = np.where(same, mid, lo)
+        f_lo = np.where(same, f, f_lo)
+        hi = np.where(same, hi, mid)
+    return (lo + hi) / 2, before
+
+
+def grid_step(system, index, samples_per_turn=SAMPLES_PER_TURN):
+    """Grid spacing fine enough for the fastest apparent motion among bodies `index`.
+
+    A planet turns at its own speed round the sun and at its speed less
+    the sun's relative to the Earth-sun line; events are spaced by those.
+    """
+    sun = system.year()
+    speed = np.abs(system.speed[index])
+    if sun:
+        speed = np.maximum(speed, np.abs(system.speed[index] - 2 * np.pi / sun))
+    return 2 * np.pi / max(float(speed.max()), 1e-12) / samples_per_turn
+
+
+def _key(system, index, start, end, step, tol):
+    h = hashlib.sha1()
+    for arr in (system.init_angle, system.speed, system.dist, system.kind):
+        h.update(np.ascontiguousarray(arr[index]).tobytes())
+    h.update(np.array([system.sun_dist, system.moon_dist, start, end, step, tol, CACHE_VERSION]).tobytes())
+    return h.hexdigest()
+
+
+def scan(system, end, start=0.0, index=None, step=None, tol=1e-9, cache_dir=None):
+    """Events of bodies `index` between model times start and end, from Earth at the origin.
+
+    index defaults to every named body except the sun; the sun is added if
+    missing, since elongations are measured from it. step is the grid
+    spacing (default grid_step()): events closer together than that, like
+    the two stations of a barely-retrograde turn, can be missed. Found
+    sign changes are refined to within tol.
+
+    Returns (names, events): events is an EVENT_DTYPE array sorted by time
+    whose body field indexes names. Results are cached in memory per system
+    parameters and settings, and in cache_dir as .npz files if given.
+    """
+    labels = {b.index: b.label for b in system.bodies}
+    kind = system.kind[:system.n]
+    suns = np.flatnonzero(kind == tycho.KIND_SUN)
+    if not len(suns):
+        raise ValueError("no sun to measure elongations from")
+    if index is None:
+        index = [b.index for b in system.bodies if kind[b.index] != tycho.KIND_SUN]
+    index = [i for i in index if i != suns[0]] + [int(suns[0])]
+    names = [labels.get(i, f"slot {i}") for i in index[:-1]]
+    step = step or grid_step(system, index)
+    key = _key(system, index, start, end, step, tol)
+
+    events = _cache.get(key)
+    path = os.path.join(cache_dir, f"events-{key}.npz") if cache_dir else None
+    if events is None and path and os.path.exists(path):
+        with np.load(path) as data:
+            events = data['events']
+    if events is None:
+        events = _scan(system, index, start, end, step, tol)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(path, events=events)
+    _cache[key] = events
+    return names, events
+
+
+def _scan(system, index, start, end, step, tol):
+    sun = len(index) - 1
+    found = []
+    n = int(np.ceil((end - start) / step))
+    for first in range(0, n, CHUNK):
+        # one sample of overlap, so changes between chunks are seen
+        t = start + step * np.arange(first, min(first + CHUNK, n) + 1)
+        f = _signals(system.positions_at(t, index), system.velocities_at(t, index), sun)
+        i, body, signal = _brackets(f)
+        for k in range(sun):
+            mine = body == k
+            when, before = _refine(system, [index[k], index[sun]], t[i[mine]], t[i[mine] + 1], signal[mine], tol)
+            found.append(_events(when, body[mine], signal[mine], before))
+    events = np.concatenate(found) if found else np.empty(0, EVENT_DTYPE)
+    # the last grid point can overshoot end
+    events = events[events['t'] < end]
+    return events[np.argsort(events['t'], kind='stable')]
+
+
+def scan_samples(t, pos, sun, bodies=None):
+    """Events from sampled Earth-centred positions, e.g. a recorded run.
+
+    pos is (T, n, 2) at times t (T,), sun the sun's column; bodies
+    (default: all but the sun) picks the columns to scan, and the events'
+    body field indexes it. Without a closed form to refine on, crossings
+    are placed by linear interpolation between samples.
+    """
+    t = np.asarray(t, dtype=float)
+    bodies = [i for i in range(pos.shape[1]) if i != sun] if bodies is None else list(bodies)
+    cols = bodies + [sun]
+    pos = pos[:, cols]
+    # velocities by differences, at the midpoints of the samples
+    mid = (t[:-1] + t[1:]) / 2
+    vel = np.diff(pos, axis=0) / np.diff(t)[:, np.newaxis, np.newaxis]
+    f = _signals((pos[:-1] + pos[1:]) / 2, vel, len(cols) - 1)
+    i, body, signal = _brackets(f)
+    keep = body != len(cols) - 1
+    i, body, signal = i[keep], body[keep], signal[keep]
+    a, b = f[i, body, signal], f[i + 1, body, signal]
+    when = mid[i] + (mid[i + 1] - mid[i]) * a / (a - b)
+    events = _events(when, body, signal, a)
+    return events[np.argsort(events['t'], kind='stable')]
+
+
+def retrograde_spans(events, body):
+    """(start, end) times of body's complete retrograde loops."""
+    mine = events[events['body'] == body]
+    mine = mine[(mine['event'] == RETROGRADE_START) | (mine['event'] == RETROGRADE_END)]
+    if len(mine) and mine['event'][0] == RETROGRADE_END:
+        mine = mine[1:]  # already retrograde when the scan started
+    starts = mine['t'][mine['event'] == RETROGRADE_START]
+    ends = mine['t'][mine['event'] == RETROGRADE_END]
+    k = min(len(starts), len(ends))
+    return np.stack([starts[:k], ends[:k]], axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conjunctions, oppositions and retrograde loops seen from Earth")
+    parser.add_argument("--scene", help="scene file to scan (see scenes.py) instead of tycho.solar_system()")
+    parser.add_argument("--years", type=float, default=1000, help="turns of the sun to scan")
+    parser.add_argument("--cache", default=".events", help="directory for cached results ('' for none)")
+    parser.add_argument("--list", metavar="BODY", help="also print every event of this body")
+    args = parser.parse_args()
+
+    if args.scene:
+        import scenes
+        system = scenes.build_tycho(scenes.load(args.scene))[0]
+    else:
+        system, _ = tycho.solar_system()
+    year = system.year()
+    start = time.perf_counter()
+    names, events = scan(system, args.years * year, cache_dir=args.cache or None)
+    print(f"{len(events)} events of {len(names)} bodies over {args.years:g} years "
+          f"in {time.perf_counter() - start:.2f}s")
+    print(f"{'body':<8} {'conj':>6} {'opp':>6} {'loops':>6} {'days retrograde':>16}")
+    for i, name in enumerate(names):
+        mine = events['event'][events['body'] == i]
+        spans = retrograde_spans(events, i)
+        days = (spans[:, 1] - spans[:, 0]).mean() / year * 365.25 if len(spans) else 0.0
+        print(f"{name:<8} {(mine == CONJUNCTION).sum():>6} {(mine == OPPOSITION).sum():>6} "
+              f"{len(spans):>6} {days:>16.1f}")
+    if args.list:
+        body = names.index(args.list)
+        for e in events[events['body'] == body]:
+            print(f"year {e['t'] / year:>10.4f}  {EVENT_NAMES[e['event']]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# ===========================================
+# - Frame transforms between the heliocentric N-body model (old.py) and
+#   Earth-centred views like Tycho's (main.py), batched over whole runs
+# - Angular discrepancy between the two models, planet by planet
+#
+#   python frames.py --years 200
+#   python frames.py --trajectory nbody.traj     (a run recorded with --record)
+# ===========================================
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+import nbody
+import tycho
+from integrators import INTEGRATORS
+
+YEAR = 365.25 * 24 * 60 * 60  # seconds
+
+
+def recentre(pos, origin):
+    """(T, n, 2) positions relative to origin, a body index or (T, 2) positions.
+
+    Any frame change between the models is this translation: Sun-centred
+    to Earth-centred with origin Earth, and back with origin Sun.
+    """
+    if isinstance(origin, (int, np.integer)):
+        origin = pos[:, origin]
+    return pos - np.asarray(origin)[:, np.newaxis, :]
+
+
+def prograde(geo, sun):
+    """Mirror Earth-centred positions if needed so the sun moves counter-clockwise.
+
+    The two models run in opposite senses (and screen y points down), so
+    directions are only comparable once both are put the same way round.
+    """
+    s = geo[:, sun]
+    turn = (s[:-1, 0] * s[1:, 1] - s[:-1, 1] * s[1:, 0]).sum()
+    return geo if turn >= 0 else geo * (1, -1)
+
+
+def angle_between(a, b):
+    """Signed angle from direction b to direction a, in (-pi, pi]; both (..., 2)."""
+    cross = b[..., 0] * a[..., 1] - b[..., 1] * a[..., 0]
+    dot = (a * b).sum(axis=-1)
+    return np.arctan2(cross, dot)
+
+
+def tycho_times(seconds, system):
+    """Tycho model times at which its sun has gone round as far as the real one in `seconds`."""
+    sun = int(np.flatnonzero(system.kind[:system.n] == tycho.KIND_SUN)[0])
+    return np.asarray(seconds) / YEAR * (2 * math.pi / system.speed[sun])
+
+
+def discrepancy(helio, names, seconds, system=None):
+    """Apparent-longitude discrepancy of each planet, Tychonic model minus heliocentric.
+
+    helio: (T, n, 2) heliocentric positions at `seconds` (T,), with bodies
+    named by `names` (which must include Earth and Sun). The Tychonic model
+    (tycho.solar_system() unless given) is evaluated at matching times.
+    Returns (planet names, (T, k) radians in (-pi, pi]).
+    """
+    if system is None:
+        system, _ = tycho.solar_system()
+    labels = [b.label for b in system.bodies]
+    planets = [name for name in labels if name in names and name not in ("Sun", "Earth", "Moon")]
+    # heliocentric: as seen from Earth
+    geo = prograde(recentre(helio, names.index("Earth")), names.index("Sun"))
+    # Tychonic: Earth is already the origin
+    model = prograde(system.positions_at(tycho_times(seconds, system)), labels.index("Sun"))
+    a = model[:, [labels.index(p) for p in planets]]
+    b = geo[:, [names.index(p) for p in planets]]
+    return planets, angle_between(a, b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="How far Tycho's model strays from the heliocentric one")
+    parser.add_argument("--years", type=float, default=100, help="length of the N-body run")
+    parser.add_argument("--integrator", choices=list(INTEGRATORS), default="leapfrog", help="N-body integrator")
+    parser.add_argument("--trajectory", help="compare against this recorded nbody run instead")
+    args = parser.parse_args()
+
+    if args.trajectory:
+        from recorder import Trajectory
+        traj = Trajectory(args.trajectory)
+        names, seconds, helio = traj.names, traj.time, traj.positions
+    else:
+        import headless
+        day = 24 * 60 * 60
+        steps = int(args.years * YEAR / day)
+        start = time.perf_counter()
+        helio = headless.run_nbody(steps, integrator=args.integrator, dt=day)
+        seconds = day * np.arange(1, steps + 1)
+        names = list(nbody.SOLAR_SYSTEM_NAMES)
+        print(f"N-body: {steps} daily steps in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    planets, delta = discrepancy(helio, names, seconds)
+    print(f"Compared {len(seconds)} samples ({seconds[-1] / YEAR:.1f} years) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    delta = np.degrees(np.abs(delta))
+    print(f"{'planet':<8} {'mean':>7} {'p95':>7} {'max':>7}  (degrees)")
+    for name, d in zip(planets, delta.T):
+        print(f"{name:<8} {d.mean():>7.1f} {np.percentile(d, 95):>7.1f} {d.max():>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
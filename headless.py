@@ -0,0 +1,115 @@
+# ===========================================
+# - Headless batch runner: no window, no clock.tick
+# - Advances the main.py (geocentric) or old.py (N-body) model N steps
+#   as fast as possible and returns the positions
+#
+#   python headless.py tycho --steps 100000 --out tycho.npy
+#   python headless.py tycho --scene scenes/asteroid_belt.toml --steps 100
+# ===========================================
+
+import argparse
+import time
+
+import numpy as np
+
+import nbody
+import scenes
+import tycho
+from integrators import INTEGRATORS, get_integrator
+from recorder import TrajectoryWriter
+
+
+def run_tycho(steps, dt=1 / 60, system=None):
+    """Positions of the geocentric model after each of N steps; (steps, n, 2).
+
+    The model is closed-form in time, so this evaluates all steps at once
+    instead of stepping.
+    """
+    if system is None:
+        system, _ = tycho.solar_system()
+    t = system.elapsed[0] if system.n else 0.0
+    return system.positions_at(t + dt * np.arange(1, steps + 1))
+
+
+def run_nbody(steps, planets=None, integrator='euler', dt=None):
+    """Step the N-body model (TIMESTEP per step by default); returns (steps, n, 2) in meters."""
+    if planets is None:
+        planets = nbody.solar_system()
+    integrator = get_integrator(integrator)
+    out = np.empty((steps, len(planets), 2))
+    for i in range(steps):
+        nbody.step(planets, record_orbit=False, integrator=integrator, dt=dt)
+        out[i] = [(p.x, p.y) for p in planets]
+    return out
+
+
+def record_tycho(path, steps, dt=1 / 60, system=None, chunk=4096):
+    """Stream N steps of the geocentric model to a trajectory file, a chunk at a time."""
+    if system is None:
+        system, _ = tycho.solar_system()
+    t0 = system.elapsed[0] if system.n else 0.0
+    # only the named bodies; a scene's belts aren't recorded
+    named = [b.index for b in system.bodies]
+    with TrajectoryWriter(path, [b.label for b in system.bodies], dt, tycho.UNITS, chunk=chunk, model='tycho') as out:
+        for start in range(0, steps, chunk):
+            t = t0 + dt * np.arange(start + 1, min(start + chunk, steps) + 1)
+            out.extend(t, system.positions_at(t, named))
+    return len(named)
+
+
+def record_nbody(path, steps, planets=None, integrator='euler', dt=None, names=None):
+    """Step the N-body model, streaming positions and velocities to a trajectory file."""
+    if names is None:
+        names = nbody.SOLAR_SYSTEM_NAMES if planets is None else [f"body {i}" for i in range(len(planets))]
+    if planets is None:
+        planets = nbody.solar_system()
+    integrator = get_integrator(integrator)
+    dt = planets[0].TIMESTEP if dt is None else dt
+    with TrajectoryWriter(path, names, dt, nbody.UNITS, velocities=True, model='nbody') as out:
+        for _ in range(steps):
+            nbody.step(planets, record_orbit=False, integrator=integrator, dt=dt)
+            state = np.array([(p.x, p.y, p.x_vel, p.y_vel) for p in planets])
+            out.append(planets[0].time, state[:, :2], state[:, 2:])
+    return len(planets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a simulation without opening a window")
+    parser.add_argument("model", choices=["tycho", "nbody"])
+    parser.add_argument("--steps", type=int, default=10000)
+    parser.add_argument("--dt", type=float, help="step size (tycho default 1/60, nbody default Planet.TIMESTEP seconds)")
+    parser.add_argument("--integrator", choices=list(INTEGRATORS), default="euler", help="nbody integrator")
+    parser.add_argument("--scene", help="build the bodies from this scene file (see scenes.py)")
+    parser.add_argument("--out", help="save positions to this .npy file")
+    parser.add_argument("--record", help="stream every step to this trajectory file instead (see recorder.py)")
+    args = parser.parse_args()
+
+    system = planets = names = None
+    if args.scene:
+        scene = scenes.load(args.scene)
+        if args.model == "tycho":
+            system = scenes.build_tycho(scene)[0]
+        else:
+            names, planets = scenes.build_nbody(scene)
+
+    start = time.perf_counter()
+    if args.record:
+        if args.model == "tycho":
+            n = record_tycho(args.record, args.steps, args.dt or 1 / 60, system)
+        else:
+            n = record_nbody(args.record, args.steps, planets, args.integrator, args.dt, names)
+        print(f"{args.model}: {args.steps} steps of {n} bodies recorded to {args.record} "
+              f"in {time.perf_counter() - start:.3f}s")
+        return
+    if args.model == "tycho":
+        positions = run_tycho(args.steps, args.dt or 1 / 60, system)
+    else:
+        positions = run_nbody(args.steps, planets, args.integrator, args.dt)
+    elapsed = time.perf_counter() - start
+    print(f"{args.model}: {args.steps} steps of {positions.shape[1]} bodies in {elapsed:.3f}s")
+    if args.out:
+        np.save(args.out, positions)
+
+
+if __name__ == "__main__":
+    main()
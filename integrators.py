@@ -0,0 +1,172 @@
+# ===========================================
+# - Integrators for the N-body model (nbody.py)
+# - Every integrator is called as integrator(pos, vel, dt, accel) and
+#   returns the new (pos, vel); accel(pos) gives the accelerations
+# ===========================================
+
+import argparse
+import time
+
+import numpy as np
+
+
+def euler(pos, vel, dt, accel):
+    # semi-implicit (symplectic) Euler, what old.py has always used
+    vel = vel + accel(pos) * dt
+    return pos + vel * dt, vel
+
+
+def leapfrog(pos, vel, dt, accel):
+    # kick-drift-kick velocity Verlet, 2nd order and symplectic
+    vel = vel + accel(pos) * (dt / 2)
+    pos = pos + vel * dt
+    return pos, vel + accel(pos) * (dt / 2)
+
+
+# Yoshida's 4th order coefficients built from three leapfrog sub-steps
+_W0 = -2 ** (1 / 3) / (2 - 2 ** (1 / 3))
+_W1 = 1 / (2 - 2 ** (1 / 3))
+_YOSHIDA_C = (_W1 / 2, (_W0 + _W1) / 2, (_W0 + _W1) / 2, _W1 / 2)
+_YOSHIDA_D = (_W1, _W0, _W1)
+
+
+def yoshida(pos, vel, dt, accel):
+    # 4th order symplectic drift-kick sequence
+    for c, d in zip(_YOSHIDA_C, _YOSHIDA_D):
+        pos = pos + vel * (c * dt)
+        vel = vel + accel(pos) * (d * dt)
+    return pos + vel * (_YOSHIDA_C[-1] * dt), vel
+
+
+class RK45:
+    """Adaptive Dormand-Prince 5(4) integrator.
+
+    Each call still advances exactly dt, but internally takes as many
+    sub-steps as the error tolerance needs and remembers the last good
+    sub-step size for the next call.
+    """
+
+    # Dormand-Prince tableau
+    A = (
+        (),
+        (1 / 5,),
+        (3 / 40, 9 / 40),
+        (44 / 45, -56 / 15, 32 / 9),
+        (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+        (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+        (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+    )
+    B = (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0)
+    B_LOW = (5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40)
+
+    MIN_STEP = 1e-12  # smallest sub-step, as a fraction of dt
+
+    def __init__(self, rtol=1e-9, atol=1e-3):
+        self.rtol = rtol
+        self.atol = atol
+        self.h = None      # last accepted sub-step size
+        self.substeps = 0  # accepted sub-steps so far, for reports
+
+    def _attempt(self, pos, vel, h, accel):
+        kx, kv = [], []
+        for a in self.A:
+            p = pos + h * sum(c * k for c, k in zip(a, kx)) if a else pos
+            v = vel + h * sum(c * k for c, k in zip(a, kv)) if a else vel
+            kx.append(v)
+            kv.append(accel(p))
+        new_pos = pos + h * sum(b * k for b, k in zip(self.B, kx))
+        new_vel = vel + h * sum(b * k for b, k in zip(self.B, kv))
+        err_pos = h * sum((b - bl) * k for b, bl, k in zip(self.B, self.B_LOW, kx))
+        err_vel = h * sum((b - bl) * k for b, bl, k in zip(self.B, self.B_LOW, kv))
+        scale_pos = self.atol + self.rtol * np.maximum(np.abs(pos), np.abs(new_pos))
+        scale_vel = self.atol + self.rtol * np.maximum(np.abs(vel), np.abs(new_vel))
+        err = max(np.abs(err_pos / scale_pos).max(), np.abs(err_vel / scale_vel).max())
+        return new_pos, new_vel, err
+
+    def __call__(self, pos, vel, dt, accel):
+        remaining = dt
+        h = self.h or dt
+        h_min = abs(dt) * self.MIN_STEP
+        while remaining > 0:
+            step = min(h, remaining)
+            new_pos, new_vel, err = self._attempt(pos, vel, step, accel)
+            # a NaN or inf would shrink h forever without being accepted
+            if not np.isfinite(err):
+                raise FloatingPointError(f"RK45: non-finite error estimate at sub-step {step:g}")
+            if err <= 1:
+                pos, vel = new_pos, new_vel
+                remaining -= step
+                self.substeps += 1
+                if step < h:
+                    continue  # shortened to land exactly on dt, keep h
+            h = step * (5.0 if err == 0 else min(5.0, max(0.2, 0.9 * err ** -0.2)))
+            if h < h_min and remaining > h_min:
+                raise RuntimeError(f"RK45: sub-step fell below {h_min:g} with {remaining:g} of dt left")
+        self.h = h
+        return pos, vel
+
+
+INTEGRATORS = {
+    'euler': euler,
+    'leapfrog': leapfrog,
+    'yoshida': yoshida,
+    'rk45': RK45,
+}
+
+
+def get_integrator(name):
+    integrator = INTEGRATORS[name]
+    # stateful integrators get a fresh instance per run
+    return integrator() if isinstance(integrator, type) else integrator
+
+
+def total_energy(pos, vel, mass, G):
+    kinetic = 0.5 * (mass * np.einsum('ij,ij->i', vel, vel)).sum()
+    d = pos[np.newaxis, :, :] - pos[:, np.newaxis, :]
+    r = np.sqrt(np.einsum('ijk,ijk->ij', d, d))
+    i, j = np.triu_indices(len(pos), 1)
+    potential = -G * (mass[i] * mass[j] / r[i, j]).sum()
+    return kinetic + potential
+
+
+def energy_report(years=100, timesteps_days=(1, 2, 8, 32), names=None):
+    """Relative energy drift and wall time per integrator and timestep.
+
+    Runs the old.py solar system and returns rows of
+    (integrator, timestep in days, steps, seconds, max |dE / E0|).
+    """
+    import nbody
+
+    rows = []
+    for name in names or INTEGRATORS:
+        for days in timesteps_days:
+            planets = nbody.solar_system()
+            pos, vel, mass = nbody.state_arrays(planets)
+            G = planets[0].G
+            integrator = get_integrator(name)
+            dt = days * 24 * 60 * 60
+            steps = int(years * 365.25 / days)
+            e0 = total_energy(pos, vel, mass, G)
+            drift = 0.0
+            start = time.perf_counter()
+            for i in range(steps):
+                pos, vel = integrator(pos, vel, dt, lambda p: nbody.accelerations(p, mass, G))
+                if i % 16 == 0 or i == steps - 1:
+                    drift = max(drift, abs((total_energy(pos, vel, mass, G) - e0) / e0))
+            rows.append((name, days, steps, time.perf_counter() - start, drift))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Energy drift of each integrator on the old.py solar system")
+    parser.add_argument("--years", type=float, default=100)
+    parser.add_argument("--days", type=float, nargs="+", default=[1, 2, 8, 32], help="timesteps to try")
+    parser.add_argument("--integrators", nargs="+", choices=list(INTEGRATORS))
+    args = parser.parse_args()
+    print(f"{'integrator':<10} {'dt (days)':>9} {'steps':>8} {'seconds':>8} {'max |dE/E0|':>12}")
+    for name, days, steps, seconds, drift in energy_report(args.years, args.days, args.integrators):
+        print(f"{name:<10} {days:>9g} {steps:>8} {seconds:>8.2f} {drift:>12.3e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,165 +10,303 @@
 # - Date:   27 Apr 2022
 # ===========================================
 
-import pygame
+import argparse
 import math
+import os
+
+import numpy as np
+import pygame
 
-# Initialize Pygame
-pygame.init()
+import scenes
+import snapshot
+import tycho
+from camera import Camera
+from picking import GridIndex, draw_tooltip
+from profiler import profiler
+from recorder import TrajectoryWriter
+from render import MIN_BODY_PX, LayeredRenderer
+from scheduler import FixedStep
+from sprites import CircleBatch, atlas
+from textcache import build_panel, render_text
 
 # Screen dimensions and center
 SCREEN_WIDTH, SCREEN_HEIGHT = 1400, 900
 CENTER_X, CENTER_Y = SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Tycho Brahe Solar System")
+camera = Camera(CENTER_X, CENTER_Y)
 
-# Colors
+# Colors (body colors live with the model in tycho.py)
 COLOR_BG      = (36, 36, 36)
 COLOR_EARTH   = (107, 147, 214)
-COLOR_SUN     = (252, 150,   1)
-COLOR_MOON    = (200, 200, 200)
-COLOR_MERCURY = (169, 169, 169)
-COLOR_VENUS   = ( 80, 200, 120)
-COLOR_MARS    = (188,  39,  50)
-COLOR_JUPITER = (205, 133,  63)
-COLOR_SATURN  = (210, 180, 140)
 COLOR_WHITE   = (255, 255, 255)
 
-# Font
-FONT = pygame.font.SysFont("Trebuchet MS", 20)
+circles = CircleBatch(MIN_BODY_PX)
+picker = GridIndex()
+_pickable = (None, None, None)  # (what's drawn, its slots, pixel radii)
+
+# Window, renderer and fonts; set up by init(), not on import
+screen = renderer = None
+FONT = FONT_MONO = None
+
+# Simulated time skipped by PgUp/PgDn
+SKIP_TIME = 100
 
-# Distances (in pixels)
-SUN_DIST        = 500  # Increased: Sun orbits Earth at this radius
-MOON_DIST       = 60   # Moon orbits Earth
-MERCURY_DIST    = 100
-VENUS_DIST      = 150
-MARS_DIST       = 200
-JUPITER_DIST    = 275
-SATURN_DIST     = 325
+# Physics runs in fixed steps of simulated time; J/K change how many are
+# taken per frame, never how big they are
+STEP = 1 / 60
+MAX_STEPS = 4096  # per frame; steps are batched, so this is cheap
+MAX_TIMESCALE = 1024
 
-class Body:
+
+def init():
+    """Open the window and load the fonts."""
+    global screen, renderer, FONT, FONT_MONO
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Tycho Brahe Solar System")
+    renderer = LayeredRenderer(screen, COLOR_BG)
+    FONT = pygame.font.SysFont("Trebuchet MS", 20)
+    FONT_MONO = pygame.font.SysFont("Courier New", 14)
+
+
+class Body(tycho.Body):
     SCALE = 1.0  # zoom
-    sun_world = (0.0, 0.0)  # sun position in world coords
-
-    def __init__(self, label, color, speed, init_angle, radius, dist, kind='planet'):
-        self.label = label
-        self.color = color
-        self.speed = speed
-        self.angle = init_angle
-        self.radius = radius
-        self.dist = dist
-        self.kind = kind  # 'sun', 'moon', or 'planet'
-        self.trail = []
-        self.world = (0.0, 0.0)
-
-    def update(self, dt):
-        self.angle += self.speed * dt
-        # world coords
-        if self.kind == 'sun':
-            wx = SUN_DIST * math.cos(self.angle)
-            wy = SUN_DIST * math.sin(self.angle)
-            Body.sun_world = (wx, wy)
-        elif self.kind == 'moon':
-            wx = MOON_DIST * math.cos(self.angle)
-            wy = MOON_DIST * math.sin(self.angle)
-        else:
-            sx, sy = Body.sun_world
-            wx = sx + self.dist * math.cos(self.angle)
-            wy = sy + self.dist * math.sin(self.angle)
-        self.world = (wx, wy)
-        self.trail.append(self.world)
-        if len(self.trail) > 300:
-            self.trail.pop(0)
-
-    def draw(self, surf, ox, oy, show_trail=True, show_label=True):
-        # trail
-        if show_trail and len(self.trail) > 2:
-            pts = [(
-                int(CENTER_X + px * Body.SCALE + ox),
-                int(CENTER_Y + py * Body.SCALE + oy)
-            ) for px, py in self.trail]
-            pygame.draw.lines(surf, self.color, False, pts, 1)
-        # body
-        wx, wy = self.world
-        sx = int(CENTER_X + wx * Body.SCALE + ox)
-        sy = int(CENTER_Y + wy * Body.SCALE + oy)
-        pygame.draw.circle(surf, self.color, (sx, sy), int(self.radius * Body.SCALE))
-        # label
-        if show_label:
-            screen.blit(FONT.render(self.label, True, COLOR_WHITE), (sx, sy))
+
+    def draw(self, surf, ox, oy, show_trail=True, show_label=True, world=None):
+        # trail and label; the body itself is drawn by draw_bodies()
+        # world: where the body is, e.g. interpolated between steps
+        camera.set_view(Body.SCALE, ox, oy)
+        # trail: only new segments go onto the renderer's trail layer, and
+        # only the chunks of them that are on screen
+        trail = self.trail
+        if show_trail and len(trail) > 2:
+            oldest = trail.appended - len(trail)
+
+            def points(sl):
+                return trail.points()[sl.start - oldest:sl.stop - oldest]
+            with profiler.section("trails"):
+                renderer.draw_trail(self, self.color, trail.appended, points, camera.scale, camera.offset,
+                                    len(trail))
+        # label, unless the body is too small to see at this zoom or off screen
+        if show_label and int(self.radius * Body.SCALE) >= MIN_BODY_PX:
+            sx, sy = camera.point_to_screen(*(self.world if world is None else world))
+            with profiler.section("labels"):
+                label = render_text(FONT, self.label, COLOR_WHITE)
+                if renderer.visible(label.get_rect(topleft=(sx, sy))):
+                    renderer.blit(label, (sx, sy))
+
+
+def draw_bodies(bodies, world):
+    """Queue sprites for bodies at their rows of world, the (n, 2) positions of every slot."""
+    with profiler.section("bodies"):
+        circles.draw(renderer, [b.color for b in bodies], [b.radius * Body.SCALE for b in bodies],
+                     camera.to_screen(world[[b.index for b in bodies]]))
+
+
+def draw_belts(belts, world):
+    """Queue sprites for every member of each scenes.Belt at its rows of world."""
+    with profiler.section("bodies"):
+        for belt in belts:
+            circles.draw_group(renderer, belt.color, belt.radius * Body.SCALE, camera.to_screen(world[belt.slots]))
 
 
 def draw_earth(surf, ox, oy, show_label=True):
-    pygame.draw.circle(
-        surf, COLOR_EARTH,
-        (CENTER_X + ox, CENTER_Y + oy),
-        int(15 * Body.SCALE)
-    )
+    x, y = camera.center_x + ox, camera.center_y + oy
+    renderer.blit(*atlas.at(COLOR_EARTH, 15 * Body.SCALE, x, y))
     if show_label:
-        screen.blit(FONT.render("Earth", True, COLOR_WHITE), (CENTER_X + ox, CENTER_Y + oy))
+        renderer.blit(render_text(FONT, "Earth", COLOR_WHITE), (x, y))
+
+
+def draw_scene(bodies, belts, world, ox, oy, show_trails=True, show_labels=True):
+    """Belts, Earth and bodies at world, the (n, 2) positions of every slot.
+
+    Bodies are blitted over the trails, labels over the bodies.
+    """
+    draw_belts(belts, world)
+    draw_earth(screen, ox, oy, show_labels)
+    draw_bodies(bodies, world)
+    for b in bodies:
+        b.draw(screen, ox, oy, show_trails, show_labels, world[b.index])
+    with profiler.section("bodies"):
+        renderer.flush()
 
 
-def main():
+def seek(system, t):
+    """Jump to time t. Trails restart there, so the trail layer is redrawn from scratch."""
+    system.seek(t)
+    renderer.invalidate()
+
+
+def restore(system, path):
+    """Resume from the checkpoint at path, trails included, and redraw them from scratch."""
+    snapshot.restore_tycho(system, snapshot.load(path))
+    renderer.invalidate()
+
+
+def pick(bodies, belts, world, pos):
+    """Slot of the body or belt member drawn under screen point pos, or None."""
+    global _pickable
+    # what's drawn only changes with the focus or zoom, not every frame
+    key = (tuple(b.index for b in bodies), tuple(belt.slots for belt in belts), Body.SCALE)
+    if _pickable[0] != key:
+        slots = np.concatenate([np.array([b.index for b in bodies], dtype=int)] +
+                               [np.arange(belt.slots.start, belt.slots.stop) for belt in belts])
+        radii = np.concatenate([[b.radius * Body.SCALE for b in bodies]] +
+                               [np.full(len(belt), belt.radius * Body.SCALE) for belt in belts])
+        _pickable = (key, slots, radii)
+    _, slots, radii = _pickable
+    picker.build(camera.to_screen(world[slots]), radii, screen.get_size())
+    i = picker.nearest(*pos)
+    return None if i is None else int(slots[i])
+
+
+def describe(system, bodies, belts, slot, t):
+    """Tooltip lines for a slot at time t: its name, distance from Earth and speed."""
+    name = next((b.label for b in bodies if b.index == slot), None)
+    if name is None:
+        belt = next(belt for belt in belts if belt.slots.start <= slot < belt.slots.stop)
+        name = f"{belt.label or 'Belt'} #{slot - belt.slots.start + 1}"
+    x, y = system.positions_at(t, [slot])[0]
+    vx, vy = system.velocities_at(t, [slot])[0]
+    return [name, f"Distance from Earth: {math.hypot(x, y):.0f} px", f"Speed: {math.hypot(vx, vy):.1f} px/s"]
+
+
+def main(checkpoint=None, interval=60.0, record=None, scene=None):
+    """Run the simulation; with a checkpoint path, resume from it and save to it every interval seconds.
+
+    With a record path, every step's positions are streamed to that trajectory file.
+    scene is a scene file (see scenes.py) to use instead of tycho.solar_system().
+    """
+    init()
     clock = pygame.time.Clock()
     running = True
     ox = oy = 0
     show_labels = True
     show_trails = True
     timescale = 1
-    active = 7 # 7 is all, 2-6 are Mercury-Saturn (index in bodies)
-
-    # create bodies: sun, moon, and planets
-    sun     = Body("Sun", COLOR_SUN,     0.5,  0.0, 20,    0, kind='sun')
-    moon    = Body("Moon", COLOR_MOON,    2.0,  math.radians(0), 6, 0, kind='moon')
-    mercury = Body("Mercury", COLOR_MERCURY, 3.0,  math.radians(0), 5, MERCURY_DIST)
-    venus   = Body("Venus", COLOR_VENUS,   2.5,  math.radians(45), 7, VENUS_DIST)
-    mars    = Body("Mars", COLOR_MARS,    1.8,  math.radians(90), 6, MARS_DIST)
-    jupiter = Body("Jupiter", COLOR_JUPITER, 1.2,  math.radians(135),12, JUPITER_DIST)
-    saturn  = Body("Saturn", COLOR_SATURN,  0.8,  math.radians(180),10, SATURN_DIST)
-    bodies = [sun, moon, mercury, venus, mars, jupiter, saturn]
+    scheduler = FixedStep(STEP, MAX_STEPS)
+
+    # create bodies: sun, moon, and planets (and any belts the scene has)
+    if scene:
+        system, bodies, belts = scenes.build_tycho(scenes.load(scene), Body)
+    else:
+        system, bodies = tycho.solar_system(body_cls=Body)
+        belts = []
+    active = len(bodies) # len(bodies) is all, 2 and up are the planets (index in bodies)
+    # scenes can give bodies their own trail lengths; time warp replaces the shortest first
+    shortest_trail = min((b.trail.capacity for b in bodies), default=tycho.TRAIL_LENGTH)
+    selected = None  # slot clicked on, whose details stay up
+    checkpointer = None
+    if checkpoint:
+        if os.path.exists(checkpoint):
+            restore(system, checkpoint)
+        checkpointer = snapshot.Checkpointer(checkpoint, interval)
+    recorder = TrajectoryWriter(record, [b.label for b in bodies], STEP, tycho.UNITS, model='tycho') if record else None
+    named = [b.index for b in bodies]  # recorded; belts aren't
+
+    # static help text, composited once into the background layer
+    help_panel, help_pos = build_panel(FONT, [
+        ("Arrows to pan, Scroll to zoom, A to focus on one planet", COLOR_WHITE, (10, 40)),
+        ("S: Toggle trails, J/K: Slow down/speed up, L: Toggle labels", COLOR_WHITE, (10, 70)),
+        ("PgUp/PgDn: Skip forward/back in time", COLOR_WHITE, (10, 100)),
+        ("Hover over or click a body for its distance and speed", COLOR_WHITE, (10, 130)),
+        ("F3: Profiler overlay, F4: Start/stop a Chrome trace", COLOR_WHITE, (10, 160)),
+    ])
+    renderer.background.blit(help_panel, help_pos)
+    renderer.invalidate()
 
     while running:
+        profiler.frame()
         dt = clock.tick(60) / 1000.0 * timescale
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                running = False
-            elif e.type == pygame.KEYDOWN:
-                if e.key in (pygame.K_x, pygame.K_ESCAPE): running = False
-                if e.key == pygame.K_a: active = 2 if active == 7 else active + 1
-                if e.key == pygame.K_l: show_labels = not show_labels
-                if e.key == pygame.K_s: show_trails = not show_trails
-                if e.key == pygame.K_j: timescale *= 0.5
-                if e.key == pygame.K_k: timescale *= 2
-            elif e.type == pygame.MOUSEBUTTONDOWN:
-                if e.button == 4: Body.SCALE *= 1.1
-                if e.button == 5: Body.SCALE *= 0.9
-
-        # pan
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:  ox += 5
-        if keys[pygame.K_RIGHT]: ox -= 5
-        if keys[pygame.K_UP]:    oy += 5
-        if keys[pygame.K_DOWN]:  oy -= 5
-
-        # update and draw
-        screen.fill(COLOR_BG)
-        draw_earth(screen, ox, oy, show_labels)
-        for n, b in enumerate(bodies):
-            b.update(dt)
-            if active == 7:
-                b.draw(screen, ox, oy, show_trails, show_labels)
-            # Only draw sun, moon, and active planet
-            elif n < 2 or active == n:
-                b.draw(screen, ox, oy, show_trails, show_labels)
-
-        # UI
-        screen.blit(FONT.render(f"FPS: {int(clock.get_fps())}", True, COLOR_WHITE), (10, 10))
-        screen.blit(FONT.render("Arrows to pan, Scroll to zoom, A to focus on one planet", True, COLOR_WHITE), (10, 40))
-        screen.blit(FONT.render("S: Toggle trails, J/K: Slow down/speed up, L: Toggle labels", True, COLOR_WHITE), (10, 70))
-
-        pygame.display.flip()
+        clicked = None
+        with profiler.section("events"):
+            for e in pygame.event.get():
+                if e.type == pygame.QUIT:
+                    running = False
+                elif e.type == pygame.KEYDOWN:
+                    if e.key in (pygame.K_x, pygame.K_ESCAPE): running = False
+                    if e.key == pygame.K_a: active = 2 if active == len(bodies) else active + 1
+                    if e.key == pygame.K_l: show_labels = not show_labels
+                    if e.key == pygame.K_s: show_trails = not show_trails
+                    if e.key == pygame.K_j: timescale *= 0.5
+                    if e.key == pygame.K_k: timescale = min(timescale * 2, MAX_TIMESCALE)
+                    # positions are closed-form in time, so skipping is free
+                    if e.key == pygame.K_PAGEUP: seek(system, system.elapsed[0] + SKIP_TIME)
+                    if e.key == pygame.K_PAGEDOWN: seek(system, system.elapsed[0] - SKIP_TIME)
+                    if e.key == pygame.K_F3: profiler.show_overlay = not profiler.show_overlay
+                    if e.key == pygame.K_F4: profiler.toggle_trace()
+                elif e.type == pygame.MOUSEBUTTONDOWN:
+                    if e.button == 4: Body.SCALE *= 1.1
+                    if e.button == 5: Body.SCALE *= 0.9
+                    if e.button == 1: clicked = e.pos
+
+            # pan
+            keys = pygame.key.get_pressed()
+            if keys[pygame.K_LEFT]:  ox += 5
+            if keys[pygame.K_RIGHT]: ox -= 5
+            if keys[pygame.K_UP]:    oy += 5
+            if keys[pygame.K_DOWN]:  oy -= 5
+
+        # update
+        with profiler.section("update"):
+            steps = scheduler.advance(dt)
+            if recorder and steps:
+                t = system.elapsed[0] + STEP * np.arange(1, steps + 1)
+                recorder.extend(t, system.positions_at(t, named))
+            system.advance(STEP, steps)
+            # the model is closed-form, so bodies are drawn exactly where
+            # they are between steps
+            now = system.elapsed[0] + scheduler.accumulator
+            render = system.positions_at(now)
+
+        # draw (the renderer redraws everything only when the view changes, or
+        # when time warp replaced a good part of the trails in one frame)
+        if steps > shortest_trail * renderer.stale_fraction:
+            renderer.invalidate()
+        camera.set_view(Body.SCALE, ox, oy)
+        atlas.set_zoom(Body.SCALE)
+        renderer.begin((camera.version, show_trails, active))
+        # Only draw sun, moon, and active planet (unless all are active)
+        shown = [b for n, b in enumerate(bodies) if active == len(bodies) or n < 2 or active == n]
+        draw_scene(shown, belts, render, ox, oy, show_trails, show_labels)
+
+        # details of the body under the pointer, else of the one clicked on
+        if clicked or pygame.mouse.get_focused():
+            with profiler.section("picking"):
+                hovered = pick(shown, belts, render, clicked or pygame.mouse.get_pos())
+                if clicked:
+                    selected = hovered
+                slot = selected if hovered is None else hovered
+                if slot is not None:
+                    draw_tooltip(renderer, FONT, describe(system, bodies, belts, slot, now),
+                                 camera.point_to_screen(*render[slot]))
+
+        # UI (help text is part of the static background)
+        renderer.mark(screen.blit(render_text(FONT, f"FPS: {int(clock.get_fps())}", COLOR_WHITE), (10, 10)))
+        warp = f"Timescale: {timescale:g}x" + (" (limited)" if scheduler.behind else "")
+        renderer.mark(screen.blit(render_text(FONT, warp, COLOR_WHITE), (110, 10)))
+        if profiler.show_overlay:
+            with profiler.section("overlay"):
+                renderer.mark(profiler.draw_overlay(screen, FONT_MONO, (SCREEN_WIDTH - 10, 10)))
+
+        with profiler.section("flip"):
+            renderer.end()
+        if checkpointer:
+            with profiler.section("checkpoint"):
+                checkpointer.maybe_save(lambda: snapshot.tycho_state(system))
 
+    if checkpointer:
+        checkpointer.save_now(snapshot.tycho_state(system))
+    if recorder:
+        recorder.close()
+    if profiler.tracing:
+        profiler.toggle_trace()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Tycho Brahe's geocentric solar system")
+    parser.add_argument("--checkpoint", help="resume from this .npz snapshot (if it exists) and keep saving to it")
+    parser.add_argument("--interval", type=float, default=60.0, help="seconds between checkpoints")
+    parser.add_argument("--record", help="stream every step's positions to this trajectory file (see recorder.py)")
+    parser.add_argument("--scene", help="load the bodies from this scene file (see scenes.py)")
+    args = parser.parse_args()
+    main(args.checkpoint, args.interval, args.record, args.scene)
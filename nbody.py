@@ -0,0 +1,243 @@
+# ===========================================
+# - Heliocentric N-body model: physics only
+# - No pygame here, so it can run headless (see headless.py)
+# ===========================================
+
+import math
+
+import numpy as np
+
+from integrators import euler
+from trail import OrbitHistory
+
+# Above this many bodies gravity() switches from all-pairs to Barnes-Hut
+BARNES_HUT_MIN = 1000
+# Barnes-Hut opening angle: a node is used whole when size / distance < theta
+BARNES_HUT_THETA = 0.5
+# Units of the model's time, positions and velocities (for recorder.py)
+UNITS = {'time': 's', 'length': 'm', 'velocity': 'm/s'}
+YEAR = 365.25 * 24 * 60 * 60  # seconds
+# Colors of planets
+COLOR_SUN = (252, 150, 1)
+COLOR_MERCURY = (173, 168, 165)
+COLOR_VENUS = (227, 158, 28)
+COLOR_EARTH = (107, 147, 214)
+COLOR_MARS = (193, 68, 14)
+COLOR_JUPITER = (216, 202, 157)
+COLOR_SATURN = (191, 189, 175)
+COLOR_URANUS = (209, 231, 231)
+COLOR_NEPTUNE = (63, 84, 186)
+
+
+class Planet:
+    AU = 149.6e6 * 1000  # Astronomical unit
+    G = 6.67428e-11  # Gravitational constant
+    TIMESTEP = 60 * 60 * 24 * 2  # Seconds in 2 days
+    SCALE = 200 / AU
+    # Orbit retention (see trail.OrbitHistory): 2000 points at full
+    # resolution, then three levels each 4x sparser; 2000 * (1 + 4 + 16 + 64)
+    # steps, ~930 years at 2 days a step
+    ORBIT_HISTORY = {'max_points': 2000, 'levels': 4, 'factor': 4}
+
+    def __init__(self, x, y, radius, color, mass):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.color = color
+        self.mass = mass
+        self.orbit = OrbitHistory(**self.ORBIT_HISTORY)
+        self.time = 0.0  # simulated seconds
+        self.sun = False
+        self.distance_to_sun = 0
+        self.x_vel = 0
+        self.y_vel = 0
+
+    def attraction(self, other):
+        other_x, other_y = other.x, other.y
+        distance_x = other_x - self.x
+        distance_y = other_y - self.y
+        distance = math.sqrt(distance_x ** 2 + distance_y ** 2)
+        if other.sun:
+            self.distance_to_sun = distance
+        force = self.G * self.mass * other.mass / distance ** 2
+        # unit vector straight from the components, no atan2/cos/sin needed
+        force_x = force * distance_x / distance
+        force_y = force * distance_y / distance
+        return force_x, force_y
+
+    def update_position(self, planets, record_orbit=True):
+        total_fx = total_fy = 0
+        for planet in planets:
+            if self == planet:
+                continue
+            fx, fy = self.attraction(planet)
+            total_fx += fx
+            total_fy += fy
+        self.x_vel += total_fx / self.mass * self.TIMESTEP
+        self.y_vel += total_fy / self.mass * self.TIMESTEP
+        self.x += self.x_vel * self.TIMESTEP
+        self.y += self.y_vel * self.TIMESTEP
+        self.time += self.TIMESTEP
+        if record_orbit:
+            self.orbit.append((self.x, self.y), self.time)
+
+    def update_scale(self, scale):
+        self.radius *= scale
+
+
+def pairwise_accelerations(pos, mass, G=Planet.G):
+    """All-pairs gravitational acceleration for (n, 2) positions in one pass."""
+    d = pos[np.newaxis, :, :] - pos[:, np.newaxis, :]  # d[i, j] points from i to j
+    r2 = np.einsum('ijk,ijk->ij', d, d)
+    np.fill_diagonal(r2, np.inf)  # no self-attraction
+    inv_r3 = r2 ** -1.5
+    return G * np.einsum('ij,ijk->ik', inv_r3 * mass, d)
+
+
+def _build_quadtree(pos, mass, max_depth=32):
+    # Level-by-level quadtree: each pass splits every node that still holds
+    # more than one body. Returns per-node center of mass, mass, size, the
+    # (n_nodes, 4) child table and the body held by single-body leaves.
+    lo = pos.min(axis=0)
+    size = float((pos.max(axis=0) - lo).max()) or 1.0
+    total = mass.sum()
+    com = [(mass @ pos / total if total else pos.mean(axis=0))[np.newaxis, :]]
+    node_mass = [np.array([total])]
+    sizes = [np.array([size])]
+    corners = [lo[np.newaxis, :]]
+    children = [np.full((1, 4), -1)]
+    leaf_body = [np.full(1, -1)]
+    first = 0
+    active = np.arange(len(pos))                   # bodies still sharing a node
+    local = np.zeros(len(pos), dtype=np.int64)     # their node, within the level
+    for _ in range(max_depth):
+        members = np.bincount(local, minlength=len(sizes[-1]))
+        alone = members[local] == 1
+        leaf_body[-1][local[alone]] = active[alone]
+        active, local = active[~alone], local[~alone]
+        if not len(active):
+            break
+        half = sizes[-1][local] / 2
+        corner = corners[-1][local]
+        p = pos[active]
+        quad = (p[:, 0] >= corner[:, 0] + half) + 2 * (p[:, 1] >= corner[:, 1] + half)
+        keys, local = np.unique(local * 4 + quad, return_inverse=True)
+        parent, q = np.divmod(keys, 4)
+        first += len(sizes[-1])
+        children[-1][parent, q] = first + np.arange(len(keys))
+        half = sizes[-1][parent] / 2
+        corners.append(corners[-1][parent] + np.stack([q & 1, q >> 1], axis=1) * half[:, np.newaxis])
+        sizes.append(half)
+        m = np.bincount(local, weights=mass[active], minlength=len(keys))
+        moment = np.stack([np.bincount(local, weights=mass[active] * p[:, k], minlength=len(keys))
+                           for k in range(2)], axis=1)
+        com.append(moment / np.where(m > 0, m, 1)[:, np.newaxis])
+        node_mass.append(m)
+        children.append(np.full((len(keys), 4), -1))
+        leaf_body.append(np.full(len(keys), -1))
+    # anything left after max_depth is (nearly) coincident and stays an aggregate leaf
+    return (np.concatenate(com), np.concatenate(node_mass), np.concatenate(sizes),
+            np.concatenate(children), np.concatenate(leaf_body))
+
+
+def barnes_hut_accelerations(pos, mass, theta=BARNES_HUT_THETA, G=Planet.G):
+    """O(n log n) approximate accelerations from a Barnes-Hut quadtree.
+
+    All bodies walk the tree together: (body, node) pairs are either accepted
+    (leaf, or node small enough as seen from the body) or replaced by the
+    node's children, one vectorized pass per tree level.
+    """
+    n = len(pos)
+    com, node_mass, size, children, leaf_body = _build_quadtree(pos, mass)
+    is_leaf = (children < 0).all(axis=1)
+    acc = np.zeros_like(pos, dtype=float)
+    body = np.arange(n)
+    node = np.zeros(n, dtype=np.int64)
+    while len(body):
+        d = com[node] - pos[body]
+        r2 = np.einsum('ij,ij->i', d, d)
+        accept = is_leaf[node] | (size[node] ** 2 < theta ** 2 * r2)
+        use = accept & (leaf_body[node] != body) & (r2 > 0)
+        f = G * node_mass[node[use]] * r2[use] ** -1.5
+        for k in range(2):
+            acc[:, k] += np.bincount(body[use], weights=f * d[use, k], minlength=n)
+        kids = children[node[~accept]].ravel()
+        body = np.repeat(body[~accept], 4)[kids >= 0]
+        node = kids[kids >= 0]
+    return acc
+
+
+def accelerations(pos, mass, G=Planet.G, bh_min=BARNES_HUT_MIN, theta=BARNES_HUT_THETA):
+    """Gravity on every body: exact all-pairs below bh_min bodies, Barnes-Hut above."""
+    if len(pos) >= bh_min:
+        return barnes_hut_accelerations(pos, mass, theta, G)
+    return pairwise_accelerations(pos, mass, G)
+
+
+def state_arrays(planets):
+    """(pos, vel, mass) arrays gathered from a list of planets."""
+    pos = np.array([(p.x, p.y) for p in planets], dtype=float)
+    vel = np.array([(p.x_vel, p.y_vel) for p in planets], dtype=float)
+    mass = np.array([p.mass for p in planets], dtype=float)
+    return pos, vel, mass
+
+
+def step(planets, record_orbit=True, integrator=euler, dt=None):
+    """Advance every planet by dt (default TIMESTEP) with the given integrator.
+
+    All planets move together from the state at the start of the step, so
+    the result no longer depends on the order of the planets list. See
+    integrators.py for the available integrators.
+    """
+    pos, vel, mass = state_arrays(planets)
+    G = planets[0].G
+    dt = planets[0].TIMESTEP if dt is None else dt
+    pos, vel = integrator(pos, vel, dt, lambda p: accelerations(p, mass, G))
+    suns = [i for i, p in enumerate(planets) if p.sun]
+    if suns:
+        dist = np.hypot(*(pos - pos[suns[0]]).T)
+    for i, p in enumerate(planets):
+        p.x_vel, p.y_vel = vel[i].tolist()
+        p.x, p.y = pos[i].tolist()
+        p.time += dt
+        if suns and not p.sun:
+            p.distance_to_sun = float(dist[i])
+        if record_orbit:
+            p.orbit.append((p.x, p.y), p.time)
+
+
+# Names of the bodies solar_system() returns, in the same order
+SOLAR_SYSTEM_NAMES = ("Neptune", "Uranus", "Saturn", "Jupiter", "Mars", "Earth", "Venus", "Mercury", "Sun")
+
+
+def solar_system(planet_cls=Planet):
+    """The sun and eight planets, outermost first as in old.py."""
+    # Metric from: https://nssdc.gsfc.nasa.gov/planetary/factsheet/
+    sun = planet_cls(0, 0, 30 * planet_cls.SCALE * 10 ** 9, COLOR_SUN, 1.98892 * 10 ** 30)
+    sun.sun = True
+
+    mercury = planet_cls(-0.387 * planet_cls.AU, 0, 5 * planet_cls.SCALE * 10 ** 9, COLOR_MERCURY, 3.30 * 10 ** 23)
+    mercury.y_vel = 47.4 * 1000
+
+    venus = planet_cls(-0.723 * planet_cls.AU, 0, 9 * planet_cls.SCALE * 10 ** 9, COLOR_VENUS, 4.8685 * 10 ** 24)
+    venus.y_vel = 35.02 * 1000
+
+    earth = planet_cls(-1 * planet_cls.AU, 0, 10 * planet_cls.SCALE * 10 ** 9, COLOR_EARTH, 5.9722 * 10 ** 24)
+    earth.y_vel = 29.783 * 1000
+
+    mars = planet_cls(-1.524 * planet_cls.AU, 0, 5 * planet_cls.SCALE * 10 ** 9, COLOR_MARS, 6.39 * 10 ** 23)
+    mars.y_vel = 24.077 * 1000
+
+    jupiter = planet_cls(-5.204 * planet_cls.AU, 0, 20 * planet_cls.SCALE * 10 ** 9, COLOR_JUPITER, 1.898 * 10 ** 27)
+    jupiter.y_vel = 13.06 * 1000
+
+    saturn = planet_cls(-9.573 * planet_cls.AU, 0, 18 * planet_cls.SCALE * 10 ** 9, COLOR_SATURN, 5.683 * 10 ** 26)
+    saturn.y_vel = 9.68 * 1000
+
+    uranus = planet_cls(-19.165 * planet_cls.AU, 0, 14 * planet_cls.SCALE * 10 ** 9, COLOR_URANUS, 8.681 * 10 ** 25)
+    uranus.y_vel = 6.80 * 1000
+
+    neptune = planet_cls(-30.178 * planet_cls.AU, 0, 12 * planet_cls.SCALE * 10 ** 9, COLOR_NEPTUNE, 1.024 * 10 ** 26)
+    neptune.y_vel = 5.43 * 1000
+
+    return [neptune, uranus, saturn, jupiter, mars, earth, venus, mercury, sun]
@@ -18,236 +18,289 @@
 
 # In Tycho Brahe's system, they use angle and trig for the circulator patterns 
 
-import pygame
+import argparse
 import math
+import os
+
+import numpy as np
+import pygame
+
+import nbody
+import scenes
+import snapshot
+from integrators import INTEGRATORS, get_integrator
+from picking import GridIndex, draw_tooltip
+from profiler import profiler
+from recorder import TrajectoryWriter
+from render import MIN_BODY_PX, LayeredRenderer
+from scheduler import FixedStep
+from sprites import CircleBatch, atlas
+from textcache import build_panel, render_text
 
-pygame.init()
 WIDTH, HEIGHT = 400, 400
-WINDOW = pygame.display.set_mode((800,800))
 
-# Colors of planets
+# Colors of planets (the rest live with the model in nbody.py)
 COLOR_WHITE = (255, 255, 255)
 COLOR_UNIVERSE = (36, 36, 36)
-COLOR_SUN = (252, 150, 1)
-COLOR_MERCURY = (173, 168, 165)
-COLOR_VENUS = (227, 158, 28)
-COLOR_EARTH = (107, 147, 214)
-COLOR_MARS = (193, 68, 14)
-COLOR_JUPITER = (216, 202, 157)
-COLOR_SATURN = (191, 189, 175)
-COLOR_URANUS = (209, 231, 231)
-COLOR_NEPTUNE = (63, 84, 186)
-
-FONT_1 = pygame.font.SysFont("Trebuchet MS", 21)
-FONT_2 = pygame.font.SysFont("Trebuchet MS", 16)
-
-pygame.display.set_caption("Tycho Brahe's System Simulation")
-
-
-class Planet:
-    AU = 149.6e6 * 1000  # Astronomical unit
-    G = 6.67428e-11  # Gravitational constant
-    TIMESTEP = 60 * 60 * 24 * 2  # Seconds in 2 days
-    SCALE = 200 / AU
-
-    def __init__(self, x, y, radius, color, mass):
-        self.x = x
-        self.y = y
-        self.radius = radius
-        self.color = color
-        self.mass = mass
-        self.orbit = []
-        self.sun = False
-        self.distance_to_sun = 0
-        self.x_vel = 0
-        self.y_vel = 0
-
-    def draw(self, window, show, move_x, move_y, draw_line):
-        """
+
+circles = CircleBatch(MIN_BODY_PX)
+picker = GridIndex()
+
+# Window, renderer and fonts; set up by init(), not on import
+WINDOW = renderer = None
+FONT_1 = FONT_2 = FONT_MONO = None
+
+# Physics takes fixed TIMESTEP steps, STEPS_PER_SECOND of them per real
+# second at 1x, however fast frames are drawn
+STEPS_PER_SECOND = 60
+MAX_STEPS = 64          # per frame
+STEP_BUDGET = 0.008     # wall seconds per frame spent stepping, at most
+MAX_TIMESCALE = 32
+
+
+def init():
+    """Open the window and load the fonts."""
+    global WINDOW, renderer, FONT_1, FONT_2, FONT_MONO
+    pygame.init()
+    WINDOW = pygame.display.set_mode((800,800))
+    pygame.display.set_caption("Tycho Brahe's System Simulation")
+    renderer = LayeredRenderer(WINDOW, COLOR_UNIVERSE)
+    FONT_1 = pygame.font.SysFont("Trebuchet MS", 21)
+    FONT_2 = pygame.font.SysFont("Trebuchet MS", 16)
+    FONT_MONO = pygame.font.SysFont("Courier New", 13)
+
+
+class Planet(nbody.Planet):
+    def draw_orbit(self, window, move_x, move_y):
+        if len(self.orbit) > 2:
+            # only the orbit points the trail layer hasn't seen, at the
+            # current level of detail, get projected
+            with profiler.section("trails"):
+                renderer.draw_history(self.orbit, self.color, self.SCALE, (WIDTH / 2 + move_x, HEIGHT / 2 + move_y))
+
+    def draw(self, window, move_x, move_y, draw_line):
+        """Orbit line; the planet itself is drawn by draw_planets(), its details by draw_tooltip().
+
         Args:
             self: The thing (planet) to be drawn
             window: The pygame graphical window
-            show: 
         """
-        x = self.x * self.SCALE + WIDTH / 2
-        y = self.y * self.SCALE + HEIGHT / 2
-        if len(self.orbit) > 2:
-            updated_points = []
-            for point in self.orbit:
-                x, y = point
-                x = x * self.SCALE + WIDTH / 2
-                y = y * self.SCALE + HEIGHT / 2
-                updated_points.append((x + move_x, y + move_y))
-            if draw_line:
-                pygame.draw.lines(window, self.color, False, updated_points, 1)
-        pygame.draw.circle(window, self.color, (x + move_x, y + move_y), self.radius)
-        if not self.sun:
-            distance_text = FONT_2.render(f"{round(self.distance_to_sun * 1.057 * 10 ** -16, 8)} light years", True,
-                                          COLOR_WHITE)
-            if show:
-                window.blit(distance_text, (x - distance_text.get_width() / 2 + move_x,
-                                            y - distance_text.get_height() / 2 - 20 + move_y))
-
-    def attraction(self, other):
-        other_x, other_y = other.x, other.y
-        distance_x = other_x - self.x
-        distance_y = other_y - self.y
-        distance = math.sqrt(distance_x ** 2 + distance_y ** 2)
-        if other.sun:
-            self.distance_to_sun = distance
-        force = self.G * self.mass * other.mass / distance ** 2
-        theta = math.atan2(distance_y, distance_x)
-        force_x = math.cos(theta) * force
-        force_y = math.sin(theta) * force
-        return force_x, force_y
-
-    def update_position(self, planets):
-        total_fx = total_fy = 0
-        for planet in planets:
-            if self == planet:
-                continue
-            fx, fy = self.attraction(planet)
-            total_fx += fx
-            total_fy += fy
-        self.x_vel += total_fx / self.mass * self.TIMESTEP
-        self.y_vel += total_fy / self.mass * self.TIMESTEP
-        self.x += self.x_vel * self.TIMESTEP
-        self.y += self.y_vel * self.TIMESTEP
-        self.orbit.append((self.x, self.y))
-
-    def update_scale(self, scale):
-        self.radius *= scale
-
-
-def main():
-    run = True
-    pause = False
-    show_distance = False
-    clock = pygame.time.Clock()
-    move_x = 0
-    move_y = 0
-    draw_line = True
-
-    # Metric from: https://nssdc.gsfc.nasa.gov/planetary/factsheet/
-
-    sun = Planet(0, 0, 30 * Planet.SCALE * 10 ** 9, COLOR_SUN, 1.98892 * 10 ** 30)
-    sun.sun = True
-
-    mercury = Planet(-0.387 * Planet.AU, 0, 5 * Planet.SCALE * 10 ** 9, COLOR_MERCURY, 3.30 * 10 ** 23)
-    mercury.y_vel = 47.4 * 1000
+        if draw_line:
+            self.draw_orbit(window, move_x, move_y)
 
-    venus = Planet(-0.723 * Planet.AU, 0, 9 * Planet.SCALE * 10 ** 9, COLOR_VENUS, 4.8685 * 10 ** 24)
-    venus.y_vel = 35.02 * 1000
+    def describe(self, name):
+        # tooltip lines; the distance changes every step, so it's only
+        # rendered for the one planet being looked at
+        lines = [name, f"Speed: {math.hypot(self.x_vel, self.y_vel) / 1000:.2f} km/s"]
+        if not self.sun:
+            lines.insert(1, f"{round(self.distance_to_sun * 1.057 * 10 ** -16, 8)} light years from the sun")
+        return lines
 
-    earth = Planet(-1 * Planet.AU, 0, 10 * Planet.SCALE * 10 ** 9, COLOR_EARTH, 5.9722 * 10 ** 24)
-    earth.y_vel = 29.783 * 1000
 
-    mars = Planet(-1.524 * Planet.AU, 0, 5 * Planet.SCALE * 10 ** 9, COLOR_MARS, 6.39 * 10 ** 23)
-    mars.y_vel = 24.077 * 1000
+def draw_planets(planets, pos, move_x, move_y):
+    """Queue sprites for planets at pos, their (n, 2) positions in meters."""
+    with profiler.section("bodies"):
+        circles.draw(renderer, [p.color for p in planets], [p.radius for p in planets],
+                     pos * Planet.SCALE + (WIDTH / 2 + move_x, HEIGHT / 2 + move_y))
 
-    jupiter = Planet(-5.204 * Planet.AU, 0, 20 * Planet.SCALE * 10 ** 9, COLOR_JUPITER, 1.898 * 10 ** 27)
-    jupiter.y_vel = 13.06 * 1000
 
-    saturn = Planet(-9.573 * Planet.AU, 0, 18 * Planet.SCALE * 10 ** 9, COLOR_SATURN, 5.683 * 10 ** 26)
-    saturn.y_vel = 9.68 * 1000
+def pick(planets, pos, move_x, move_y, at):
+    """Index of the planet drawn under screen point at, or None; pos is their (n, 2) positions in meters."""
+    picker.build(pos * Planet.SCALE + (WIDTH / 2 + move_x, HEIGHT / 2 + move_y), [p.radius for p in planets],
+                 WINDOW.get_size())
+    return picker.nearest(*at)
 
-    uranus = Planet(-19.165 * Planet.AU, 0, 14 * Planet.SCALE * 10 ** 9, COLOR_URANUS, 8.681 * 10 ** 25)
-    uranus.y_vel = 6.80 * 1000
 
-    neptune = Planet(-30.178 * Planet.AU, 0, 12 * Planet.SCALE * 10 ** 9, COLOR_NEPTUNE, 1.024 * 10 ** 26)
-    neptune.y_vel = 5.43 * 1000
+def main(checkpoint=None, interval=60.0, record=None, scene=None, history=None):
+    """Run the simulation; with a checkpoint path, resume from it and save to it every interval seconds.
 
-    planets = [neptune, uranus, saturn, jupiter, mars, earth, venus, mercury, sun]
+    With a record path, every step's positions and velocities are streamed to that trajectory file.
+    scene is a scene file (see scenes.py) to use instead of nbody.solar_system().
+    history overrides some of Planet.ORBIT_HISTORY, how much orbit each planet keeps (see trail.OrbitHistory).
+    """
+    init()
+    if history:
+        Planet.ORBIT_HISTORY = {**Planet.ORBIT_HISTORY, **history}
+    run = True
+    pause = False
+    selected = None  # planet clicked on, whose details stay up
+    clock = pygame.time.Clock()
+    move_x = 0
+    move_y = 0
+    draw_line = True
+    integrator_name = 'euler'
+    integrator = get_integrator(integrator_name)
+    timescale = 1
+
+    if scene:
+        names, planets = scenes.build_nbody(scenes.load(scene), Planet)
+    else:
+        names, planets = list(nbody.SOLAR_SYSTEM_NAMES), nbody.solar_system(Planet)
+    sun = next((p for p in planets if p.sun), planets[-1])
+    checkpointer = None
+    if checkpoint:
+        if os.path.exists(checkpoint):
+            saved = snapshot.load(checkpoint)
+            snapshot.restore_nbody(planets, saved)
+            if str(saved.get('integrator', '')) in INTEGRATORS:
+                integrator_name = str(saved['integrator'])
+                integrator = get_integrator(integrator_name)
+        checkpointer = snapshot.Checkpointer(checkpoint, interval)
+    recorder = None
+    if record:
+        recorder = TrajectoryWriter(record, names, Planet.TIMESTEP, nbody.UNITS,
+                                    velocities=True, model='nbody')
+
+    def state():
+        return dict(snapshot.nbody_state(planets), integrator=np.array(integrator_name))
+    scheduler = FixedStep(Planet.TIMESTEP, MAX_STEPS, STEP_BUDGET)
+    previous = np.array([(p.x, p.y) for p in planets])
+
+    def physics_step(dt):
+        # remember where the planets were, to interpolate between steps
+        previous[:] = [(p.x, p.y) for p in planets]
+        nbody.step(planets, integrator=integrator, dt=dt)
+        if recorder:
+            rows = np.array([(p.x, p.y, p.x_vel, p.y_vel) for p in planets])
+            recorder.append(sun.time, rows[:, :2], rows[:, 2:])
+
+    # Help text and map legend never change, so composite them once into the background;
+    # the legend lists the bodies innermost first, below the help text
+    legend = [(f"- {name}", p.color, (15, 285 + 30 * i))
+              for i, (name, p) in enumerate(reversed(list(zip(names, planets))))]
+    info_y = 285 + 30 * len(planets)  # integrator line, then the profiler keys
+    legend_panel, legend_pos = build_panel(FONT_1, [
+        ("Press X or ESC to exit", COLOR_WHITE, (15, 45)),
+        ("Hover over or click a planet for its distance", COLOR_WHITE, (15, 75)),
+        ("Press S to turn on/off drawing orbit lines", COLOR_WHITE, (15, 105)),
+        ("Use mouse or arrow keys to move around", COLOR_WHITE, (15, 135)),
+        ("Press C to center", COLOR_WHITE, (15, 165)),
+        ("Press Space to pause/unpause", COLOR_WHITE, (15, 195)),
+        ("Use scroll-wheel to zoom", COLOR_WHITE, (15, 225)),
+        ("Press I to switch integrator, J/K to slow down/speed up", COLOR_WHITE, (15, 255)),
+        *legend,
+        ("F3: Profiler overlay, F4: Start/stop a trace", COLOR_WHITE, (15, info_y + 30)),
+    ])
+    renderer.background.blit(legend_panel, legend_pos)
+    renderer.invalidate()
 
     while run:
-        clock.tick(60)
-        WINDOW.fill(COLOR_UNIVERSE)
-
-        # This handles key presses
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and
-                                             (event.key == pygame.K_x or event.key == pygame.K_ESCAPE)):
-                run = False
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                pause = not pause
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_d:
-                show_distance = not show_distance
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_c:
-                move_x, move_y = -sun.x * sun.SCALE, -sun.y * sun.SCALE
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_s:
-                draw_line = not draw_line
-            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 5:
-                Planet.SCALE *= 0.75
-                for planet in planets:
-                    planet.update_scale(0.75)
-            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 4:
-                Planet.SCALE *= 1.25
-                for planet in planets:
-                    planet.update_scale(1.25)
-
-        keys = pygame.key.get_pressed()
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-        window_w, window_h = pygame.display.get_surface().get_size()
-        distance = 10
-        if keys[pygame.K_LEFT] or mouse_x == 0:
-            move_x += distance
-        if keys[pygame.K_RIGHT] or mouse_x == window_w - 1:
-            move_x -= distance
-        if keys[pygame.K_UP] or mouse_y == 0:
-            move_y += distance
-        if keys[pygame.K_DOWN] or mouse_y == window_h - 1:
-            move_y -= distance
-
-        # Update planet position
+        profiler.frame()
+        dt = clock.tick(60) / 1000 * STEPS_PER_SECOND * Planet.TIMESTEP * timescale
+
+        clicked = None
+        with profiler.section("events"):
+            # This handles key presses
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and
+                                                 (event.key == pygame.K_x or event.key == pygame.K_ESCAPE)):
+                    run = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                    pause = not pause
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_c:
+                    move_x, move_y = -sun.x * sun.SCALE, -sun.y * sun.SCALE
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_i:
+                    choices = list(INTEGRATORS)
+                    integrator_name = choices[(choices.index(integrator_name) + 1) % len(choices)]
+                    integrator = get_integrator(integrator_name)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_j:
+                    timescale *= 0.5
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_k:
+                    timescale = min(timescale * 2, MAX_TIMESCALE)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.show_overlay = not profiler.show_overlay
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    profiler.toggle_trace()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_s:
+                    draw_line = not draw_line
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    clicked = event.pos
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 5:
+                    Planet.SCALE *= 0.75
+                    for planet in planets:
+                        planet.update_scale(0.75)
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 4:
+                    Planet.SCALE *= 1.25
+                    for planet in planets:
+                        planet.update_scale(1.25)
+
+            keys = pygame.key.get_pressed()
+            mouse_x, mouse_y = pygame.mouse.get_pos()
+            window_w, window_h = pygame.display.get_surface().get_size()
+            distance = 10
+            if keys[pygame.K_LEFT] or mouse_x == 0:
+                move_x += distance
+            if keys[pygame.K_RIGHT] or mouse_x == window_w - 1:
+                move_x -= distance
+            if keys[pygame.K_UP] or mouse_y == 0:
+                move_y += distance
+            if keys[pygame.K_DOWN] or mouse_y == window_h - 1:
+                move_y -= distance
+
+        # Update planet positions in fixed steps (each one batched gravity step
+        # for all of them) and draw them interpolated between the last two
+        if not pause:
+            with profiler.section("update"):
+                scheduler.run(dt, physics_step)
+        current = np.array([(p.x, p.y) for p in planets])
+        render = previous + (current - previous) * scheduler.alpha
+        # Only changed areas are redrawn unless the view moved
+        atlas.set_zoom(Planet.SCALE)
+        renderer.begin((Planet.SCALE, move_x, move_y, draw_line))
+        # planets go over the orbit lines, the tooltip over the planets
+        draw_planets(planets, render, move_x, move_y)
         for planet in planets:
-            if not pause:
-                planet.update_position(planets)
-            if show_distance:
-                planet.draw(WINDOW, 1, move_x, move_y, draw_line)
-            else:
-                planet.draw(WINDOW, 0, move_x, move_y, draw_line)
+            planet.draw(WINDOW, move_x, move_y, draw_line)
+        with profiler.section("bodies"):
+            renderer.flush()
+        # details of the planet under the pointer, else of the one clicked on
+        if clicked or pygame.mouse.get_focused():
+            with profiler.section("picking"):
+                hovered = pick(planets, render, move_x, move_y, clicked or pygame.mouse.get_pos())
+                if clicked:
+                    selected = hovered
+                i = selected if hovered is None else hovered
+                if i is not None:
+                    x, y = render[i] * Planet.SCALE + (WIDTH / 2 + move_x, HEIGHT / 2 + move_y)
+                    draw_tooltip(renderer, FONT_2, planets[i].describe(names[i]), (x, y))
 
         # Rendering the text, map legend, etc.
-        fps_text = FONT_1.render("FPS: " + str(int(clock.get_fps())), True, COLOR_WHITE)
-        WINDOW.blit(fps_text, (15, 15))
-        text_surface = FONT_1.render("Press X or ESC to exit", True, COLOR_WHITE)
-        WINDOW.blit(text_surface, (15, 45))
-        text_surface = FONT_1.render("Press D to turn on/off distance", True, COLOR_WHITE)
-        WINDOW.blit(text_surface, (15, 75))
-        text_surface = FONT_1.render("Press S to turn on/off drawing orbit lines", True, COLOR_WHITE)
-        WINDOW.blit(text_surface, (15, 105))
-        text_surface = FONT_1.render("Use mouse or arrow keys to move around", True, COLOR_WHITE)
-        WINDOW.blit(text_surface, (15, 135))
-        text_surface = FONT_1.render("Press C to center", True, COLOR_WHITE)
-        WINDOW.blit(text_surface, (15, 165))
-        text_surface = FONT_1.render("Press Space to pause/unpause", True, COLOR_WHITE)
-        WINDOW.blit(text_surface, (15, 195))
-        text_surface = FONT_1.render("Use scroll-wheel to zoom", True, COLOR_WHITE)
-        WINDOW.blit(text_surface, (15, 225))
-        sun_surface = FONT_1.render("- Sun", True, COLOR_SUN)
-        WINDOW.blit(sun_surface, (15, 285))
-        mercury_surface = FONT_1.render("- Mercury", True, COLOR_MERCURY)
-        WINDOW.blit(mercury_surface, (15, 315))
-        venus_surface = FONT_1.render("- Venus", True, COLOR_VENUS)
-        WINDOW.blit(venus_surface, (15, 345))
-        earth_surface = FONT_1.render("- Earth", True, COLOR_EARTH)
-        WINDOW.blit(earth_surface, (15, 375))
-        mars_surface = FONT_1.render("- Mars", True, COLOR_MARS)
-        WINDOW.blit(mars_surface, (15, 405))
-        jupiter_surface = FONT_1.render("- Jupiter", True, COLOR_JUPITER)
-        WINDOW.blit(jupiter_surface, (15, 435))
-        saturn_surface = FONT_1.render("- Saturn", True, COLOR_SATURN)
-        WINDOW.blit(saturn_surface, (15, 465))
-        uranus_surface = FONT_1.render("- Uranus", True, COLOR_URANUS)
-        WINDOW.blit(uranus_surface, (15, 495))
-        neptune_surface = FONT_1.render("- Neptune", True, COLOR_NEPTUNE)
-        WINDOW.blit(neptune_surface, (15, 525))
-
-        # Actually updates the GUI
-        pygame.display.update()
-
+        fps_text = render_text(FONT_1, "FPS: " + str(int(clock.get_fps())), COLOR_WHITE)
+        renderer.mark(WINDOW.blit(fps_text, (15, 15)))
+        renderer.mark(WINDOW.blit(render_text(FONT_1, "Integrator: " + integrator_name, COLOR_WHITE), (15, info_y)))
+        warp = f"Timescale: {timescale:g}x" + (" (limited)" if scheduler.behind else "")
+        renderer.mark(WINDOW.blit(render_text(FONT_1, warp, COLOR_WHITE), (120, 15)))
+        if profiler.show_overlay:
+            with profiler.section("overlay"):
+                renderer.mark(profiler.draw_overlay(WINDOW, FONT_MONO, (WINDOW.get_width() - 10, 10)))
+
+        # Actually updates the GUI (just the changed rectangles)
+        with profiler.section("flip"):
+            renderer.end()
+        if checkpointer:
+            with profiler.section("checkpoint"):
+                checkpointer.maybe_save(state)
+
+    if checkpointer:
+        checkpointer.save_now(state())
+    if recorder:
+        recorder.close()
+    if profiler.tracing:
+        profiler.toggle_trace()
     pygame.quit()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Tycho Brahe's System Simulation (N-body)")
+    parser.add_argument("--checkpoint", help="resume from this .npz snapshot (if it exists) and keep saving to it")
+    parser.add_argument("--interval", type=float, default=60.0, help="seconds between checkpoints")
+    parser.add_argument("--record", help="stream every step's positions and velocities to this trajectory file")
+    parser.add_argument("--scene", help="load the bodies from this scene file (see scenes.py)")
+    parser.add_argument("--history-points", type=int, help="orbit points kept per planet at full resolution")
+    parser.add_argument("--history-levels", type=int, help="levels of sparser, older orbit history after those")
+    parser.add_argument("--history-years", type=float, help="drop orbit history older than this many simulated years")
+    args = parser.parse_args()
+    history = {'max_points': args.history_points, 'levels': args.history_levels,
+               'max_span': args.history_years and args.history_years * nbody.YEAR}
+    main(args.checkpoint, args.interval, args.record, args.scene,
+         {k: v for k, v in history.items() if v is not None})
\ No newline at end of file
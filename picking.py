@@ -0,0 +1,95 @@
+# ===========================================
+# - Picking bodies with the mouse: a uniform grid over the screen
+#   positions of every body, so hovering or clicking one only looks at
+#   the few cells around the pointer, even in a belt of 100k bodies
+# - Tooltip with the details of the one body that's hovered or picked
+# ===========================================
+
+import numpy as np
+import pygame
+
+COLOR_TOOLTIP = (20, 20, 20, 220)
+
+
+class GridIndex:
+    """Screen points bucketed into cell x cell pixel cells.
+
+    build() sorts the points by cell, starting from last frame's order:
+    bodies move a pixel or so a frame, so that order is nearly sorted
+    already and the stable sort finishes in about one pass. Points off
+    screen go to one extra cell that's never searched. nearest() then
+    only looks at the cells within reach of the pointer.
+    """
+
+    def __init__(self, cell=16):
+        self.cell = cell
+        self._order = None
+        self._points = self._radii = self._starts = self._big = None
+        self._pad = 0.0
+        self._cols = self._rows = 0
+
+    def build(self, points, radii, size):
+        """Index (n, 2) screen points of bodies with pixel radii radii (a scalar or (n,)), on a size screen."""
+        points = np.asarray(points, dtype=float)
+        n = len(points)
+        cols, rows = -(-size[0] // self.cell), -(-size[1] // self.cell)
+        # clipped first, so points far off screen (zoomed in) can't overflow
+        cells = np.clip(points * (1 / self.cell), -1, max(cols, rows))
+        cells = np.floor(cells, out=cells).astype(np.int32)
+        cx, cy = cells[:, 0], cells[:, 1]
+        key = cy * cols + cx
+        key[(cx < 0) | (cx >= cols) | (cy < 0) | (cy >= rows)] = cols * rows
+        if self._order is None or len(self._order) != n:
+            self._order = np.arange(n)
+        self._order = self._order[np.argsort(key[self._order], kind='stable')]
+        self._starts = np.concatenate(([0], np.cumsum(np.bincount(key, minlength=cols * rows + 1))))
+        self._points = points
+        self._radii = np.broadcast_to(np.asarray(radii, dtype=float), (n,))
+        # bodies up to a cell wide are found from the cells around the
+        # pointer; wider ones are checked wherever they are
+        self._pad = min(float(self._radii.max()), self.cell) if n else 0.0
+        self._big = np.flatnonzero(self._radii > self.cell)
+        self._cols, self._rows = cols, rows
+
+    def nearest(self, x, y, reach=4):
+        """Index of the body under (x, y), or within reach pixels of its edge; None if there's none.
+
+        Of several, the one whose edge is closest wins, so a moon in front
+        of a large sun can still be picked.
+        """
+        if self._points is None:
+            return None
+        span = reach + self._pad
+        x0 = max(int((x - span) // self.cell), 0)
+        x1 = min(int((x + span) // self.cell), self._cols - 1)
+        y0 = max(int((y - span) // self.cell), 0)
+        y1 = min(int((y + span) // self.cell), self._rows - 1)
+        # the cells of each row in range are contiguous in the sorted order
+        rows = np.arange(y0, y1 + 1) * self._cols
+        found = [self._order[a:b] for a, b in zip(self._starts[rows + x0], self._starts[rows + x1 + 1]) if b > a]
+        if not found and not len(self._big):
+            return None
+        near = np.concatenate(found + [self._big])
+        gap = np.hypot(self._points[near, 0] - x, self._points[near, 1] - y) - self._radii[near]
+        best = int(np.argmin(gap))
+        return int(near[best]) if gap[best] <= reach else None
+
+
+def draw_tooltip(renderer, font, lines, pos, color=(255, 255, 255)):
+    """Lines of text on a dark box next to screen point pos, kept inside the screen."""
+    rendered = [font.render(text, True, color) for text in lines]
+    w = max(s.get_width() for s in rendered) + 12
+    h = sum(s.get_height() for s in rendered) + 8
+    box = pygame.Surface((w, h), pygame.SRCALPHA)
+    box.fill(COLOR_TOOLTIP)
+    y = 4
+    for s in rendered:
+        box.blit(s, (6, y))
+        y += s.get_height()
+    sw, sh = renderer.screen.get_size()
+    x, y = int(pos[0]) + 14, int(pos[1]) + 14
+    if x + w > sw:
+        x = int(pos[0]) - 14 - w
+    if y + h > sh:
+        y = int(pos[1]) - 14 - h
+    renderer.mark(renderer.screen.blit(box, (max(x, 0), max(y, 0))))
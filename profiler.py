@@ -0,0 +1,158 @@
+# ===========================================
+# - Per-frame profiling: named timed sections, rolling history,
+#   an on-screen overlay and Chrome trace (chrome://tracing) dumps
+# ===========================================
+
+import json
+import time
+
+import numpy as np
+
+_clock = time.perf_counter
+
+
+class _Section:
+    # reusable context manager, one per section name, so timing a block
+    # costs two perf_counter calls and a dict update
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = _clock()
+        return self
+
+    def __exit__(self, *exc):
+        end = _clock()
+        p = self.profiler
+        p._current[self.name] = p._current.get(self.name, 0.0) + (end - self.start)
+        if p._trace is not None:
+            p._record(self.name, self.start, end - self.start)
+        return False
+
+
+class Profiler:
+    """Named sections timed every frame, kept for the last `history` frames."""
+
+    def __init__(self, history=240, max_trace_events=1_000_000):
+        self.history = history
+        self.max_trace_events = max_trace_events
+        self.frame_times = np.zeros(history)  # ms, ring indexed by frame count
+        self.samples = {}                     # section name -> (history,) ms ring
+        self.frames = 0
+        self.show_overlay = False
+        self.overlay_refresh = 15  # frames between overlay text updates
+        self._overlay_texts = None
+        self._overlay_frame = 0
+        self._sections = {}
+        self._current = {}
+        self._last_frame = None
+        self._trace = None
+
+    def section(self, name):
+        s = self._sections.get(name)
+        if s is None:
+            s = self._sections[name] = _Section(self, name)
+        return s
+
+    def frame(self):
+        """Close the current frame; call once per main-loop iteration."""
+        now = _clock()
+        i = self.frames % self.history
+        if self._last_frame is not None:
+            self.frame_times[i] = (now - self._last_frame) * 1000
+            if self._trace is not None:
+                self._record("frame", self._last_frame, now - self._last_frame)
+        for name in self._current.keys() - self.samples.keys():
+            self.samples[name] = np.zeros(self.history)
+        for name, ring in self.samples.items():
+            ring[i] = self._current.get(name, 0.0) * 1000
+        self._current = {}
+        self._last_frame = now
+        self.frames += 1
+
+    def _window(self, ring):
+        # the filled part of a ring, oldest first
+        n = min(self.frames, self.history)
+        return np.roll(ring, -(self.frames % self.history))[-n:] if n else ring[:0]
+
+    def stats(self, name=None):
+        """p50/p95/p99/max in ms for a section (or whole frames if name is None)."""
+        data = self._window(self.frame_times if name is None else self.samples[name])
+        if not len(data):
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        p50, p95, p99 = np.percentile(data, (50, 95, 99))
+        return {"p50": p50, "p95": p95, "p99": p99, "max": data.max()}
+
+    # --- Chrome trace -----------------------------------------------------
+
+    @property
+    def tracing(self):
+        return self._trace is not None
+
+    def start_trace(self):
+        self._trace = []
+
+    def _record(self, name, start, dur):
+        # every trace event, sections and frames alike, counts towards the cap
+        if len(self._trace) < self.max_trace_events:
+            self._trace.append((name, start, dur))
+
+    def stop_trace(self, path):
+        """Stop recording and write a Chrome trace JSON file; returns the path."""
+        origin = min((start for _, start, _ in self._trace), default=0.0)
+        events = [{"name": name, "ph": "X", "pid": 0, "tid": 0,
+                   "ts": (start - origin) * 1e6, "dur": dur * 1e6}
+                  for name, start, dur in self._trace]
+        self._trace = None
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    def toggle_trace(self):
+        """F4 in the simulations: start a trace, or stop it and write trace-<time>.json."""
+        if self._trace is None:
+            self.start_trace()
+            return None
+        path = self.stop_trace(time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        print(f"Wrote {path}")
+        return path
+
+    # --- overlay ----------------------------------------------------------
+
+    def draw_overlay(self, surf, font, topright, budget_ms=1000 / 60):
+        """Frame-time graph plus a per-section p50/p95/max breakdown; returns the drawn Rect."""
+        import pygame
+
+        # the numbers are only re-computed and re-rendered every few frames
+        if self._overlay_texts is None or self.frames - self._overlay_frame >= self.overlay_refresh:
+            lines = []
+            for name in [None] + sorted(self.samples):
+                s = self.stats(name)
+                lines.append(f"{name or 'frame':<8}p50 {s['p50']:6.2f}  p95 {s['p95']:6.2f}  max {s['max']:6.2f} ms")
+            self._overlay_texts = [font.render(text, True, (255, 255, 255)) for text in lines]
+            self._overlay_frame = self.frames
+        texts = self._overlay_texts
+        width = max(t.get_width() for t in texts) + 12
+        graph_h = 80
+        panel = pygame.Surface((width, graph_h + 10 + font.get_linesize() * len(texts)), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        # frame times, scaled so the frame budget sits at half height
+        scale = graph_h / (2 * budget_ms)
+        pygame.draw.line(panel, (90, 90, 90), (0, graph_h - budget_ms * scale), (width, graph_h - budget_ms * scale))
+        times = self._window(self.frame_times)
+        if len(times) > 1:
+            xs = np.linspace(0, width - 1, len(times))
+            ys = graph_h - np.minimum(times * scale, graph_h)
+            pygame.draw.lines(panel, (120, 220, 120), False, np.stack([xs, ys], axis=1))
+        y = graph_h + 5
+        for t in texts:
+            panel.blit(t, (6, y))
+            y += font.get_linesize()
+        return surf.blit(panel, panel.get_rect(topright=topright))
+
+
+# Shared profiler used by all three simulations
+profiler = Profiler()
@@ -0,0 +1,178 @@
+# ===========================================
+# - Wire format between server.py and its viewers (viewer.py)
+# - Every message is a 5-byte header, <I payload length><B kind>, then
+#   the payload. Positions are rounded to whole multiples of the scene's
+#   `quantum` and sent as differences from a prediction made from the
+#   last frames that viewer got, in the narrowest integer type most of
+#   them fit; only a viewer's first frame carries the positions themselves
+# ===========================================
+
+import json
+import struct
+import zlib
+
+import numpy as np
+
+# message kinds
+HELLO = 1  # server -> viewer, JSON: the scene (model, bodies, quantum, ...)
+FRAME = 2  # server -> viewer: <I seq><d model time><B encoding>, then the positions (see encode_frame)
+RATE = 3   # viewer -> server: <f frames per second wanted>
+ACK = 4    # viewer -> server: <I seq> of the last frame applied
+
+HEADER = struct.Struct('<IB')
+FRAME_HEAD = struct.Struct('<IdB')
+SEQ = struct.Struct('<I')
+FPS = struct.Struct('<f')
+COUNT = struct.Struct('<I')
+
+# frame encodings: KEY is absolute int32 positions. The rest are
+# differences from a prediction of order (code - 1) // 3 made from the
+# last frames the viewer got: 0 the last frame as is, 1 a straight line
+# through the last two, 2 a parabola through the last three, by model
+# time, as frames can be any number of steps apart. Bodies on circles
+# barely change acceleration, so order 2 differences are a few quanta.
+# They go as DELTA_TYPES[(code - 1) % 3], the few that don't fit that
+# type (a fast inner planet) as patches rather than widening it for a
+# whole belt, and the lot zlib-compressed if COMPRESSED is set
+KEY = 0
+ORDERS = 3
+DELTA_TYPES = (np.int8, np.int16, np.int32)
+COMPRESSED = 0x80
+MAX_MESSAGE = 64 << 20  # bytes; anything bigger is a broken stream
+
+
+def message(kind, payload=b''):
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def hello(info):
+    return message(HELLO, json.dumps(info).encode())
+
+
+def rate(fps):
+    return message(RATE, FPS.pack(fps))
+
+
+def ack(seq):
+    return message(ACK, SEQ.pack(seq))
+
+
+def quantize(pos, quantum):
+    """(n, 2) world positions as whole multiples of quantum (int64)."""
+    return np.rint(np.asarray(pos, dtype=float) * (1 / quantum)).astype(np.int64)
+
+
+def _packed(diff):
+    """(width, bytes) of the cheapest way to send difference array diff, or None if it needs more than int32.
+
+    Entries that don't fit DELTA_TYPES[width] are sent as 0 and then
+    listed as <I count>, count int32 flat indexes, count int32 values.
+    """
+    flat = diff.ravel()
+    span = np.abs(flat)
+    if flat.size and span.max() > np.iinfo(np.int32).max:
+        return None
+    best = None
+    for width, dtype in enumerate(DELTA_TYPES):
+        over = np.flatnonzero(span > np.iinfo(dtype).max)
+        size = flat.size * np.dtype(dtype).itemsize + 8 * over.size
+        if best is None or size < best[0]:
+            best = (size, width, over)
+        if not over.size:
+            break
+    _, width, over = best
+    packed = flat.astype(DELTA_TYPES[width])
+    packed[over] = 0
+    return width, b''.join((COUNT.pack(over.size), packed.tobytes(), over.astype(np.int32).tobytes(),
+                            flat[over].astype(np.int32).tobytes()))
+
+
+def _unpacked(data, width, shape):
+    (count,) = COUNT.unpack_from(data)
+    dtype = DELTA_TYPES[width]
+    size = shape[0] * shape[1]
+    diff = np.frombuffer(data, dtype, size, COUNT.size).astype(np.int64)
+    patches = np.frombuffer(data, np.int32, 2 * count, COUNT.size + size * np.dtype(dtype).itemsize)
+    diff[patches[:count]] = patches[count:]
+    return diff.reshape(shape)
+
+
+def predict(t, history):
+    """Where the (t, q) frames of history, newest first, put the bodies at time t, moving on as they did.
+
+    A polynomial through all of them (Lagrange form), so one frame holds
+    still, two go on in a straight line and three along a parabola. Only
+    correctly rounded float operations on the same inputs, so server and
+    viewer get exactly the same answer; None if two frames share a time.
+    """
+    times = [h[0] for h in history]
+    if len(set(times)) < len(times):
+        return None
+    guess = np.zeros(history[0][1].shape)
+    for i, (ti, qi) in enumerate(history):
+        weight = 1.0
+        for j, tj in enumerate(times):
+            if j != i:
+                weight *= (t - tj) / (ti - tj)
+        guess += weight * qi
+    return np.rint(guess).astype(np.int64)
+
+
+def encode_frame(seq, t, q, history=(), compress=1):
+    """FRAME message for quantized positions q.
+
+    history is the last frames the viewer got, as (t, q) pairs, newest
+    first (up to ORDERS of them); without any, q goes whole as a keyframe.
+    compress is the zlib level for difference frames, 0 for none.
+    """
+    best = None
+    history = [h for h in history if h is not None and h[1].shape == q.shape]
+    # highest order first: it's nearly always the best, and done once it fits int8
+    for order in reversed(range(min(len(history), ORDERS))):
+        guess = predict(t, history[:order + 1])
+        packed = None if guess is None else _packed(q - guess)
+        if packed is not None and (best is None or len(packed[1]) < len(best[1])):
+            best = (1 + 3 * order + packed[0], packed[1])
+            if packed[0] == 0:
+                break
+    if best is None:
+        return message(FRAME, FRAME_HEAD.pack(seq, t, KEY) + q.astype(np.int32).tobytes())
+    code, data = best
+    small = zlib.compress(data, compress) if compress else data
+    if len(small) < len(data):
+        code, data = code | COMPRESSED, small
+    return message(FRAME, FRAME_HEAD.pack(seq, t, code) + data)
+
+
+class FrameDecoder:
+    """Positions rebuilt from a viewer's FRAME payloads, in order."""
+
+    def __init__(self, quantum):
+        self.quantum = quantum
+        self.history = []  # the last (t, q), newest first, as encode_frame() saw them
+
+    def apply(self, payload):
+        """(seq, model time, (n, 2) world positions) of one FRAME payload."""
+        seq, t, code = FRAME_HEAD.unpack_from(payload)
+        data = memoryview(payload)[FRAME_HEAD.size:]
+        if code & COMPRESSED:
+            data = zlib.decompress(data)
+        code &= ~COMPRESSED
+        if code == KEY:
+            q = np.frombuffer(data, np.int32).reshape(-1, 2).astype(np.int64)
+        else:
+            order, width = divmod(code - 1, 3)
+            if order >= len(self.history):
+                raise ValueError("difference frame without the frames it's relative to")
+            guess = predict(t, self.history[:order + 1])
+            q = guess + _unpacked(data, width, guess.shape)
+        self.history = [(t, q)] + self.history[:ORDERS - 1]
+        return seq, t, q * self.quantum
+
+
+async def read_message(reader):
+    """(kind, payload) of the next message on an asyncio StreamReader."""
+    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_MESSAGE:
+        raise ValueError(f"message of {length} bytes")
+    return kind, await reader.readexactly(length)
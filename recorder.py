@@ -0,0 +1,196 @@
+# ===========================================
+# - Streaming trajectory recorder: every step's positions (and velocities)
+#   appended to a flat on-disk file, written from a background thread
+# - Readers memory-map the file, so analysis can run on it zero-copy,
+#   even while the simulation is still writing
+#
+#   python main.py --record tycho.traj
+#   python headless.py nbody --steps 1000000 --record nbody.traj
+#
+#   traj = recorder.Trajectory("nbody.traj")
+#   traj.positions[:, traj.names.index("Earth")]   # (steps, 2), no copy
+# ===========================================
+
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b"TRAJ"
+FORMAT_VERSION = 1
+ALIGN = 64  # records start on this boundary, after the header
+
+
+def record_dtype(n, velocities=False):
+    # one step: its time, then every body's position (and velocity)
+    fields = [('t', '<f8'), ('pos', '<f8', (n, 2))]
+    if velocities:
+        fields.append(('vel', '<f8', (n, 2)))
+    return np.dtype(fields)
+
+
+def _header(meta):
+    # MAGIC, uint32 JSON length, JSON padded with spaces to ALIGN
+    body = json.dumps(meta).encode()
+    size = len(MAGIC) + 4 + len(body)
+    body += b" " * (-size % ALIGN)
+    return MAGIC + len(body).to_bytes(4, 'little') + body
+
+
+class TrajectoryWriter:
+    """Appends steps to a trajectory file without holding the run in memory.
+
+    Steps are collected into a chunk of `chunk` records; full chunks (and,
+    every flush_interval seconds, partial ones, so readers stay current)
+    are handed to a background thread that appends them to the file. At
+    most `pending` chunks wait for the disk before append() blocks, so
+    memory stays bounded however long the run is.
+    """
+
+    def __init__(self, path, names, dt, units=None, velocities=False, chunk=4096,
+                 flush_interval=1.0, pending=4, **meta):
+        self.path = path
+        self.names = list(names)
+        self.dtype = record_dtype(len(self.names), velocities)
+        self.velocities = velocities
+        self.chunk = chunk
+        self.flush_interval = flush_interval
+        self.steps = 0  # steps appended so far (not all of them on disk yet)
+        meta = dict(meta, version=FORMAT_VERSION, names=self.names, dt=dt, units=units or {},
+                    velocities=velocities, created=time.time())
+        self._file = open(path, 'wb')
+        self._file.write(_header(meta))
+        self._file.flush()
+        self._buffer = np.empty(chunk, self.dtype)
+        self._filled = 0
+        self._last_flush = time.monotonic()
+        self._queue = queue.Queue(pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def _write(self):
+        # after an error, later blocks are still taken off the queue (but not
+        # written), so flush() never blocks on a full queue; it raises instead
+        while True:
+            block = self._queue.get()
+            if block is None:
+                return
+            if self._error:
+                continue
+            try:
+                self._file.write(block.data)
+                self._file.flush()
+            except Exception as e:
+                self._error = e
+
+    def append(self, t, pos, vel=None):
+        """Record one step: time, (n, 2) positions and, if enabled, (n, 2) velocities."""
+        row = self._buffer[self._filled]
+        row['t'] = t
+        row['pos'] = pos
+        if self.velocities:
+            row['vel'] = vel
+        self._filled += 1
+        self.steps += 1
+        if self._filled == self.chunk or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def extend(self, t, pos, vel=None):
+        """Record several steps: (k,) times and (k, n, 2) positions (and velocities)."""
+        t = np.asarray(t, dtype=float)
+        done = 0
+        while done < len(t):
+            k = min(len(t) - done, self.chunk - self._filled)
+            rows = self._buffer[self._filled:self._filled + k]
+            rows['t'] = t[done:done + k]
+            rows['pos'] = pos[done:done + k]
+            if self.velocities:
+                rows['vel'] = vel[done:done + k]
+            self._filled += k
+            self.steps += k
+            done += k
+            if self._filled == self.chunk:
+                self.flush()
+        if self._filled and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        # hand what's collected to the writer thread and start a new chunk
+        if self._error:
+            raise self._error
+        self._last_flush = time.monotonic()
+        if not self._filled:
+            return
+        self._queue.put(self._buffer[:self._filled])
+        self._buffer = np.empty(self.chunk, self.dtype)
+        self._filled = 0
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+        if self._error:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class Trajectory:
+    """A trajectory file, memory-mapped read-only.
+
+    time, positions and velocities are views into the mapping, so slicing
+    them reads only the pages touched. While the file is still being
+    written, refresh() maps the steps appended since.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path}: not a trajectory file")
+            size = int.from_bytes(f.read(4), 'little')
+            self.meta = json.loads(f.read(size))
+        if self.meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported trajectory version {self.meta['version']}")
+        self.offset = len(MAGIC) + 4 + size
+        self.names = self.meta['names']
+        self.dt = self.meta['dt']
+        self.units = self.meta['units']
+        self.dtype = record_dtype(len(self.names), self.meta['velocities'])
+        self.refresh()
+
+    def refresh(self):
+        # only whole records count; the writer may be mid-way through one
+        steps = (os.path.getsize(self.path) - self.offset) // self.dtype.itemsize
+        if steps:
+            self.data = np.memmap(self.path, self.dtype, 'r', self.offset, (steps,))
+        else:
+            self.data = np.zeros(0, self.dtype)
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def time(self):
+        return self.data['t']
+
+    @property
+    def positions(self):
+        return self.data['pos']
+
+    @property
+    def velocities(self):
+        return self.data['vel'] if self.meta['velocities'] else None
@@ -0,0 +1,245 @@
+# ===========================================
+# - Layered, dirty-rect renderer shared by the three simulations
+# ===========================================
+
+import itertools
+import math
+import weakref
+
+import numpy as np
+import pygame
+
+# Level of detail: trails are thinned until their segments are about this
+# long on screen, and bodies (with their labels) whose radius is below
+# MIN_BODY_PX pixels aren't drawn
+MIN_SEGMENT_PX = 2.0
+MIN_BODY_PX = 1.0
+LOD_MIN_POINTS = 64  # shorter runs of a trail are always drawn in full
+# Trails are culled against the screen in chunks of this many points
+CHUNK = 64
+# blit_many() writes pixels directly, instead of queueing blits, for at
+# least STAMP_MIN copies of an opaque sprite of at most STAMP_MAX_AREA pixels
+STAMP_MIN = 1000
+STAMP_MAX_AREA = 16
+
+
+def decimate(pts, tol=1.0):
+    """Drop points in the same tol-pixel cell as the point before; keeps both ends."""
+    if len(pts) < 3:
+        return pts
+    cells = np.floor(pts / tol)
+    keep = np.ones(len(pts), dtype=bool)
+    keep[1:-1] = (cells[1:-1] != cells[:-2]).any(axis=1)
+    return pts[keep]
+
+
+def lod_stride(world, scale):
+    """Power-of-two stride that makes the newest segments about MIN_SEGMENT_PX long.
+
+    Strides are aligned to absolute indices, so the levels of detail act as
+    a pyramid over the trail: a point stays in the same levels as it grows.
+    """
+    if len(world) <= LOD_MIN_POINTS:
+        return 1
+    seg = np.hypot(*np.diff(world[-16:], axis=0).T).mean() * scale
+    if seg >= MIN_SEGMENT_PX:
+        return 1
+    return 2 ** math.ceil(math.log2(MIN_SEGMENT_PX / max(seg, 1e-9)))
+
+
+def visible_runs(world, start, scale, offset, size):
+    """Runs [a, b] (absolute, inclusive) of world points whose chunks are on screen.
+
+    The points are split into CHUNK-point chunks aligned to absolute indices,
+    each one's bounding box (including the first point of the next chunk,
+    for the segment between them) is tested against the screen, and
+    neighbouring visible chunks are merged into one run.
+    """
+    n = len(world)
+    bounds = np.concatenate(([0], np.arange(CHUNK - start % CHUNK, n - 1, CHUNK)))
+    joints = world[np.append(bounds[1:], n - 1)]
+    lo = np.minimum(np.minimum.reduceat(world, bounds), joints) * scale + offset
+    hi = np.maximum(np.maximum.reduceat(world, bounds), joints) * scale + offset
+    visible = (hi >= 0).all(axis=1) & (lo[:, 0] <= size[0]) & (lo[:, 1] <= size[1])
+    if visible.all():
+        return [(start, start + n - 1)]
+    ends = np.append(bounds[1:], n - 1)
+    # starts and ends of the runs of consecutive visible chunks
+    edges = np.diff(np.concatenate(([False], visible, [False])).astype(np.int8))
+    return [(start + bounds[i], start + ends[j - 1])
+            for i, j in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))]
+
+
+def lod_indices(a, b, stride):
+    # indices of [a, b] on the stride grid, plus both ends
+    idx = np.arange(a + (-a) % stride, b + 1, stride)
+    if not len(idx) or idx[0] != a:
+        idx = np.insert(idx, 0, a)
+    if idx[-1] != b:
+        idx = np.append(idx, b)
+    return idx
+
+
+class LayeredRenderer:
+    """Static background, cached trail layer and a dynamic layer on top.
+
+    While the view is unchanged only new trail segments are drawn onto the
+    trail layer, the rectangles covered by last frame's bodies and HUD are
+    restored from background + trails, and only the changed rectangles are
+    pushed with display.update(rects). Any change of view (pan, zoom,
+    toggling trails or focus) triggers one full redraw and flip.
+    """
+
+    def __init__(self, screen, bg_color, stale_fraction=0.25, max_dirty=2000):
+        self.screen = screen
+        # past this many dirty rects (e.g. a belt of tiny bodies), repainting
+        # the whole screen from the layers is cheaper than going rect by rect
+        self.max_dirty = max_dirty
+        self._bounds = screen.get_rect()
+        size = screen.get_size()
+        self.background = pygame.Surface(size)
+        self.background.fill(bg_color)
+        self.trails = pygame.Surface(size, pygame.SRCALPHA)
+        # bounded trails drop their oldest points; once this fraction of a
+        # trail is stale on the layer, the layer is rebuilt
+        self.stale_fraction = stale_fraction
+        self._view = None
+        self._full = True   # redraw everything at the next begin()
+        self._flip = False  # this frame is a full redraw
+        self._drawn = weakref.WeakKeyDictionary()  # owner -> (first index drawn, next index to draw)
+        self._dirty = []  # dynamic rects drawn this frame
+        self._rects = []  # rects to push this frame
+        self._batch = []  # (surface, dest) blits queued by blit()
+
+    def invalidate(self):
+        # e.g. after changing the background
+        self._full = True
+
+    def begin(self, view):
+        """Start a frame; view is any hashable description of the camera state."""
+        if view != self._view:
+            self._view = view
+            self._full = True
+        self._flip = self._full
+        self._full = False
+        if self._flip:
+            self.trails.fill((0, 0, 0, 0))
+            self._drawn.clear()
+            self.screen.blit(self.background, (0, 0))
+        elif len(self._dirty) > self.max_dirty:
+            self.screen.blit(self.background, (0, 0))
+            self.screen.blit(self.trails, (0, 0))
+            self._flip = True
+        else:
+            # erase last frame's bodies and HUD
+            for rect in self._dirty:
+                self.screen.blit(self.background, rect, rect)
+                self.screen.blit(self.trails, rect, rect)
+        self._rects = self._dirty
+        self._dirty = []
+
+    def draw_trail(self, owner, color, count, world, scale, offset, capacity=None):
+        """Draw the part of owner's trail that isn't on the trail layer yet.
+
+        count is the number of points ever appended to the trail and
+        world(sl) returns world points for a slice of absolute indices
+        within [first, count); they're drawn at world * scale + offset.
+        capacity is the point limit of bounded trails. Chunks of the trail
+        that are off screen are skipped before projecting anything, and
+        the rest is drawn at the level of detail the zoom allows.
+        """
+        oldest = count - capacity if capacity and count > capacity else 0
+        first, drawn = self._drawn.get(owner, (oldest, oldest))
+        if capacity and oldest - first > capacity * self.stale_fraction:
+            self._full = True  # rebuild next frame
+        self._drawn[owner] = (first, count)
+        start = max(drawn - 1, oldest)  # overlap one point to join the segments
+        if count - start < 2:
+            return
+        pts = world(slice(start, count))
+        stride = lod_stride(pts, scale)
+        for a, b in visible_runs(pts, start, scale, offset, self.screen.get_size()):
+            if b - a < 1:
+                continue
+            run = pts[lod_indices(a, b, stride) - start] if stride > 1 else pts[a - start:b - start + 1]
+            screen = decimate(run * scale + offset)
+            rect = pygame.draw.lines(self.trails, color, False, screen, 1)
+            # the same line again on the screen, rather than alpha-blitting
+            # the layer under its whole bounding box
+            pygame.draw.lines(self.screen, color, False, screen, 1)
+            self._rects.append(rect)
+
+    def visible(self, rect):
+        # whether a screen rect overlaps the window at all
+        return self._bounds.colliderect(rect)
+
+    def draw_history(self, history, color, scale, offset):
+        """Draw a trail.OrbitHistory level by level, world points * scale + offset."""
+        joint = None
+        for level in reversed(history.levels):  # oldest first
+            n = len(level)
+            if not n:
+                continue
+            pts = level.points()[:, :2]
+            oldest = level.appended - n
+
+            def world(sl, pts=pts, oldest=oldest):
+                return pts[sl.start - oldest:sl.stop - oldest]
+            if n > 1:
+                self.draw_trail(level, color, level.appended, world, scale, offset, n)
+            if joint is not None:
+                # bridge the points a coarser level skipped (changes every step)
+                self.mark(pygame.draw.line(self.screen, color, joint, pts[0] * scale + offset))
+            joint = pts[-1] * scale + offset
+
+    def mark(self, rect):
+        # a rect drawn straight onto the screen this frame (bodies, labels, HUD)
+        self._dirty.append(rect)
+        return rect
+
+    def blit(self, surface, dest):
+        # queue a blit of a body or label; flush() draws them all at once
+        self._batch.append((surface, dest))
+
+    def blit_many(self, surface, topleft):
+        # queue the same surface at each of (n, 2) top-left points
+        w, h = surface.get_size()
+        if (len(topleft) >= STAMP_MIN and w * h <= STAMP_MAX_AREA and surface.get_colorkey()
+                and self.screen.get_bytesize() in (1, 2, 4)):
+            self.flush()  # whatever was queued before goes underneath
+            self._stamp(surface, topleft)
+            return
+        self._batch.extend(zip(itertools.repeat(surface), topleft.tolist()))
+
+    def _stamp(self, surface, topleft):
+        # crowds of dots (belts): building a blit per copy costs far more
+        # than writing the sprite's few pixels with array indexing
+        sw, sh = surface.get_size()
+        w, h = self.screen.get_size()
+        mask = pygame.mask.from_surface(surface)
+        pixels = pygame.surfarray.pixels2d(self.screen)
+        for dx in range(sw):
+            for dy in range(sh):
+                if not mask.get_at((dx, dy)):
+                    continue
+                x = topleft[:, 0] + dx
+                y = topleft[:, 1] + dy
+                ok = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+                pixels[x[ok], y[ok]] = self.screen.map_rgb(surface.get_at((dx, dy)))
+        del pixels  # unlocks the screen
+        lo = topleft.min(axis=0)
+        hi = topleft.max(axis=0) + (sw, sh)
+        self._dirty.append(pygame.Rect(*lo.tolist(), *(hi - lo).tolist()).clip(self._bounds))
+
+    def flush(self):
+        """Draw the queued blits, in order, with one Surface.blits call."""
+        if self._batch:
+            self._dirty.extend(self.screen.blits(self._batch))
+            self._batch = []
+
+    def end(self):
+        self.flush()
+        if self._flip:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self._rects + self._dirty)
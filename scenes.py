@@ -0,0 +1,131 @@
+# ===========================================
+# - Scene files: the bodies of a simulation as data (TOML or JSON)
+#   instead of constructor calls in each main()
+# - Belts of up to ~100k bodies go straight into BodySystem arrays,
+#   with no Body object per member
+# - No pygame here, and the model modules are only imported once a
+#   scene for them is built, so headless tools stay quick to start
+#
+#   python main.py --scene scenes/asteroid_belt.toml
+#   python old.py --scene scenes/solar_system.toml
+#   python headless.py tycho --scene scenes/asteroid_belt.toml --steps 1000
+#
+# Every scene has a model ("tycho", "nbody" or "epicycles") and a list of
+# [[body]] tables; see scenes/*.toml for the keys each model takes. Angles
+# are in degrees. Tycho scenes can also have [[belt]] tables, where each of
+# speed, angle and dist is a number, a list with one value per member, or
+# {min = .., max = ..} for values drawn uniformly (from the belt's seed).
+# ===========================================
+
+import json
+import math
+
+import numpy as np
+
+MODELS = ("tycho", "nbody", "epicycles")
+
+
+def load(path):
+    """A scene file as a dict; .json is read as JSON, anything else as TOML."""
+    if path.endswith(".json"):
+        with open(path) as f:
+            scene = json.load(f)
+    else:
+        import tomllib
+        with open(path, "rb") as f:
+            scene = tomllib.load(f)
+    if scene.get("model") not in MODELS:
+        raise ValueError(f"{path}: model must be one of {', '.join(MODELS)}")
+    if not scene.get("body"):
+        raise ValueError(f"{path}: no [[body]] entries")
+    return scene
+
+
+def _expect(scene, model):
+    if scene["model"] != model:
+        raise ValueError(f"a {scene['model']} scene can't be built as {model}")
+
+
+def values(spec, count, rng):
+    """count floats from a belt entry: a number, a list of count, or {min, max} drawn uniformly."""
+    if isinstance(spec, dict):
+        return rng.uniform(spec["min"], spec["max"], count)
+    if isinstance(spec, list):
+        if len(spec) != count:
+            raise ValueError(f"expected {count} values, got {len(spec)}")
+        return np.asarray(spec, dtype=float)
+    return np.full(count, float(spec))
+
+
+class Belt:
+    """Bodies that share a color and radius and only exist in the system arrays."""
+
+    def __init__(self, label, slots, color, radius):
+        self.label = label
+        self.slots = slots  # slice of BodySystem slots
+        self.color = color
+        self.radius = radius
+
+    def __len__(self):
+        return self.slots.stop - self.slots.start
+
+
+def build_tycho(scene, body_cls=None):
+    """(system, bodies, belts) for a tycho scene; bodies get body_cls (default tycho.Body)."""
+    import tycho
+    _expect(scene, "tycho")
+    body_cls = body_cls or tycho.Body
+    belts = scene.get("belt", [])
+    system = tycho.BodySystem(len(scene["body"]) + sum(int(b["count"]) for b in belts))
+    system.sun_dist = float(scene.get("sun_dist", tycho.SUN_DIST))
+    system.moon_dist = float(scene.get("moon_dist", tycho.MOON_DIST))
+    bodies = []
+    for b in scene["body"]:
+        extra = {"trail_length": int(b["trail"])} if "trail" in b else {}
+        bodies.append(body_cls(b["label"], tuple(b["color"]), float(b["speed"]), math.radians(b.get("angle", 0)),
+                               b["radius"], float(b.get("dist", 0)), kind=b.get("kind", "planet"),
+                               system=system, **extra))
+    groups = []
+    for b in belts:
+        count = int(b["count"])
+        rng = np.random.default_rng(b.get("seed"))
+        slots = system.add_many(values(b["speed"], count, rng),
+                                np.radians(values(b.get("angle", {"min": 0, "max": 360}), count, rng)),
+                                values(b["dist"], count, rng), b.get("kind", "planet"))
+        groups.append(Belt(b.get("label", ""), slots, tuple(b["color"]), float(b.get("radius", 1))))
+    system.update(0, trails=False)
+    return system, bodies, groups
+
+
+def build_nbody(scene, planet_cls=None):
+    """(names, planets) for an nbody scene; planets get planet_cls (default nbody.Planet).
+
+    Positions are in AU, velocities in km/s, masses in kg and radii in
+    units of 10^9 m, drawn at the default zoom (as nbody.solar_system does).
+    """
+    import nbody
+    _expect(scene, "nbody")
+    cls = planet_cls or nbody.Planet
+    names, planets = [], []
+    for b in scene["body"]:
+        p = cls(b.get("x", 0) * cls.AU, b.get("y", 0) * cls.AU, b["radius"] * cls.SCALE * 10 ** 9,
+                tuple(b["color"]), float(b["mass"]))
+        p.x_vel = b.get("vx", 0) * 1000
+        p.y_vel = b.get("vy", 0) * 1000
+        p.sun = bool(b.get("sun", False))
+        names.append(b["label"])
+        planets.append(p)
+    return names, planets
+
+
+def build_epicycles(scene, planet_cls=None):
+    """(names, planets) for an epicycles scene; planets get planet_cls (default epicycles.PlanetAndEpicycles)."""
+    import epicycles
+    _expect(scene, "epicycles")
+    cls = planet_cls or epicycles.PlanetAndEpicycles
+    names, planets = [], []
+    for b in scene["body"]:
+        names.append(b["label"])
+        planets.append(cls(tuple(b["color"]), b["speed"], math.radians(b.get("angle", 0)), b["radius"],
+                           b.get("dist", 0), bool(b.get("sun", False))))
+    return names, planets
@@ -0,0 +1,56 @@
+# ===========================================
+# - Fixed-timestep scheduling: physics advances in whole steps of a fixed
+#   size however long each rendered frame takes
+# ===========================================
+
+import time
+
+
+class FixedStep:
+    """Accumulator that turns variable frame times into fixed simulation steps.
+
+    Each frame, advance(dt) adds dt of simulated time and returns how many
+    whole steps are due; the remainder carries over, and alpha says how far
+    the current moment is into the next step, for interpolating what is
+    drawn. At most max_steps are taken per frame (fewer if a step-time
+    budget is set and steps are slow); anything beyond that is dropped
+    rather than carried, so a slow frame can't snowball into slower ones.
+    """
+
+    def __init__(self, step, max_steps=8, budget=None):
+        self.step = step
+        self.max_steps = max_steps
+        self.budget = budget    # wall seconds per frame for stepping, or None
+        self.cost = None        # measured wall seconds per step (run() only)
+        self.accumulator = 0.0  # simulated time not yet stepped
+        self.dropped = 0.0      # simulated time skipped to keep up
+        self.behind = False     # whether the last frame had to drop time
+
+    def advance(self, dt):
+        self.accumulator += dt
+        due = int(self.accumulator // self.step)
+        limit = self.max_steps
+        if self.budget is not None and self.cost:
+            limit = max(1, min(limit, int(self.budget / self.cost)))
+        steps = min(due, limit)
+        self.behind = due > steps
+        if self.behind:
+            self.dropped += (due - steps) * self.step
+        self.accumulator = max(0.0, self.accumulator - due * self.step)
+        return steps
+
+    def run(self, dt, step_fn):
+        """advance(dt), calling step_fn(step) for every due step; returns the count."""
+        steps = self.advance(dt)
+        if steps:
+            start = time.perf_counter()
+            for _ in range(steps):
+                step_fn(self.step)
+            cost = (time.perf_counter() - start) / steps
+            self.cost = cost if self.cost is None else 0.8 * self.cost + 0.2 * cost
+        return steps
+
+    @property
+    def alpha(self):
+        # 0..1, how far into the next step the current moment is
+        return self.accumulator / self.step
@@ -0,0 +1,313 @@
+# ===========================================
+# - Simulation server: one authoritative model, stepped on the server's
+#   clock, broadcast to any number of viewers (viewer.py) so every
+#   display shows the same moment instead of drifting apart
+# - asyncio over plain TCP, frames delta-encoded (see protocol.py).
+#   Each viewer gets at most the frame rate it asked for, never more
+#   than `window` frames ahead of what it has acknowledged, and always
+#   the newest frame: a slow viewer skips frames rather than falling
+#   behind or holding up the others
+#
+#   python server.py --port 8765
+#   python server.py --scene scenes/asteroid_belt.toml --max-fps 30
+#   python server.py --model nbody --timescale 4
+#   python server.py --compress 0                 (a fast network, a slow CPU)
+# ===========================================
+
+import argparse
+import asyncio
+import collections
+import time
+
+import numpy as np
+
+import nbody
+import protocol
+import scenes
+import tycho
+from integrators import INTEGRATORS, get_integrator
+from scheduler import FixedStep
+
+STEP = 1 / 60           # model steps per wall second at 1x: 60, as in main.py and old.py
+MAX_STEPS = 4096        # per tick
+TICK_RATE = 60          # frames made per wall second
+WINDOW = 4              # frames a viewer may have unacknowledged
+ACK_TIMEOUT = 10.0      # seconds without an ack before a viewer is dropped
+MAX_BUFFER = 1 << 20    # bytes queued on a socket before writes wait
+TYCHO_QUANTUM = 1 / 64  # px
+NBODY_QUANTUM = 1e6     # m
+
+
+class TychoSim:
+    """main.py's model (with any belts), stepped as the server's authority."""
+
+    quantum = TYCHO_QUANTUM
+
+    def __init__(self, system, bodies, belts=()):
+        self.system = system
+        self.bodies = bodies
+        self.belts = belts
+
+    def info(self):
+        return {
+            "model": "tycho", "units": tycho.UNITS["length"], "scale": 1.0, "earth": True,
+            "n": self.system.n,
+            "bodies": [{"label": b.label, "color": list(b.color), "radius": b.radius, "slot": b.index}
+                       for b in self.bodies],
+            "belts": [{"label": g.label, "color": list(g.color), "radius": g.radius,
+                       "start": g.slots.start, "stop": g.slots.stop} for g in self.belts],
+        }
+
+    def advance(self, steps):
+        # closed form: however many steps, one evaluation
+        self.system.update(STEP * steps, trails=False)
+
+    @property
+    def t(self):
+        return float(self.system.elapsed[0]) if self.system.n else 0.0
+
+    def positions(self):
+        return self.system.world[:self.system.n]
+
+
+class NBodySim:
+    """old.py's model, one nbody.step per step."""
+
+    quantum = NBODY_QUANTUM
+
+    def __init__(self, names, planets, integrator='euler'):
+        self.names = names
+        self.planets = planets
+        self.integrator = get_integrator(integrator)
+
+    def info(self):
+        return {
+            "model": "nbody", "units": nbody.UNITS["length"], "scale": nbody.Planet.SCALE, "earth": False,
+            "n": len(self.planets),
+            "bodies": [{"label": name, "color": list(p.color), "radius": p.radius, "slot": i}
+                       for i, (name, p) in enumerate(zip(self.names, self.planets))],
+            "belts": [],
+        }
+
+    def advance(self, steps):
+        for _ in range(steps):
+            nbody.step(self.planets, record_orbit=False, integrator=self.integrator)
+
+    @property
+    def t(self):
+        return self.planets[0].time
+
+    def positions(self):
+        return np.array([(p.x, p.y) for p in self.planets])
+
+
+class Client:
+    """One connected viewer: what it has been sent, and its metrics."""
+
+    def __init__(self, reader, writer, fps):
+        self.reader = reader
+        self.writer = writer
+        self.name = "%s:%s" % writer.get_extra_info("peername")[:2]
+        self.fps = fps
+        self.next_send = 0.0
+        self.last_seq = None  # newest frame sent
+        self.sent = []  # (seq, t, q) of the last frames sent, newest first
+        self.inflight = {}  # seq -> send time, until acknowledged
+        self.wake = asyncio.Event()   # a new frame is out
+        self.acked = asyncio.Event()  # an ack freed room in the window
+        self.connected = time.perf_counter()
+        self.frames = self.bytes = self.skipped = 0
+        self.rtt = collections.deque(maxlen=512)  # seconds, newest acks
+        self._mark = (self.connected, 0, 0)  # for rates since the last report
+
+    def stats(self, now=None):
+        """Metrics since the previous call: fps and kB/s sent, round trips, skipped frames."""
+        now = now or time.perf_counter()
+        since, frames, sent = self._mark
+        self._mark = (now, self.frames, self.bytes)
+        span = max(now - since, 1e-9)
+        rtt = np.array(self.rtt) * 1000
+        return {
+            "client": self.name, "fps": (self.frames - frames) / span, "kB/s": (self.bytes - sent) / span / 1000,
+            "rtt_p50": float(np.percentile(rtt, 50)) if len(rtt) else None,
+            "rtt_p95": float(np.percentile(rtt, 95)) if len(rtt) else None,
+            "skipped": self.skipped, "inflight": len(self.inflight), "frames": self.frames, "bytes": self.bytes,
+        }
+
+
+class SimServer:
+    """Steps sim on the server's clock and streams it to every connected viewer."""
+
+    def __init__(self, sim, timescale=1.0, tick_rate=TICK_RATE, max_fps=TICK_RATE, window=WINDOW, compress=1):
+        self.sim = sim
+        self.timescale = timescale
+        self.tick_rate = tick_rate
+        self.max_fps = max_fps
+        self.window = window
+        self.compress = compress
+        self.clients = set()
+        self.frame = None  # (seq, model time, quantized positions), the newest
+        self._encoded = {}  # newest frame's messages, by the frames they're relative to
+        self._scheduler = FixedStep(STEP, MAX_STEPS)
+
+    def tick(self, dt):
+        """Advance dt wall seconds and make the next frame, if any step was due."""
+        steps = self._scheduler.advance(dt * self.timescale)
+        if not steps and self.frame:
+            return  # nothing moved
+        self.sim.advance(steps)
+        seq = self.frame[0] + 1 if self.frame else 0
+        self.frame = (seq, self.sim.t, protocol.quantize(self.sim.positions(), self.sim.quantum))
+        self._encoded.clear()
+        for client in self.clients:
+            client.wake.set()
+
+    async def run_clock(self):
+        loop = asyncio.get_running_loop()
+        last = due = loop.time()
+        while True:
+            # ticks on a fixed schedule, so sleeping late doesn't lower the rate
+            due += 1 / self.tick_rate
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            now = loop.time()
+            self.tick(now - last)
+            last = now
+            due = max(due, now - 1 / self.tick_rate)  # no burst of ticks after a stall
+
+    def _message(self, client):
+        # viewers that are in step (same last frames) share one encoding
+        seq, t, q = self.frame
+        key = tuple(f[0] for f in client.sent)
+        data = self._encoded.get(key)
+        if data is None:
+            history = [f[1:] for f in client.sent]
+            data = self._encoded[key] = protocol.encode_frame(seq, t, q, history, self.compress)
+        return data
+
+    async def _send(self, client):
+        loop = asyncio.get_running_loop()
+        while True:
+            await client.wake.wait()
+            client.wake.clear()
+            # rate limit: no sooner than 1/fps after the previous frame
+            delay = client.next_send - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # backpressure: wait for acks while the window is full
+            while len(client.inflight) >= self.window:
+                client.acked.clear()
+                await asyncio.wait_for(client.acked.wait(), ACK_TIMEOUT)
+            if self.frame is None or self.frame[0] == client.last_seq:
+                continue
+            seq = self.frame[0]
+            data = self._message(client)
+            if client.last_seq is not None:
+                client.skipped += seq - client.last_seq - 1
+            client.last_seq = seq
+            client.sent = [self.frame] + client.sent[:protocol.ORDERS - 1]
+            now = loop.time()
+            client.next_send = max(client.next_send + 1 / client.fps, now - 1 / client.fps)
+            client.inflight[seq] = time.perf_counter()
+            client.frames += 1
+            client.bytes += len(data)
+            client.writer.write(data)
+            await client.writer.drain()
+
+    async def _receive(self, client):
+        while True:
+            kind, payload = await protocol.read_message(client.reader)
+            if kind == protocol.ACK:
+                seq, = protocol.SEQ.unpack(payload)
+                sent = client.inflight.pop(seq, None)
+                if sent is not None:
+                    client.rtt.append(time.perf_counter() - sent)
+                # acks are cumulative: anything older was applied too
+                for old in [s for s in client.inflight if s < seq]:
+                    del client.inflight[old]
+                client.acked.set()
+            elif kind == protocol.RATE:
+                fps, = protocol.FPS.unpack(payload)
+                client.fps = min(max(fps, 0.1), self.max_fps)
+
+    async def handle(self, reader, writer):
+        client = Client(reader, writer, self.max_fps)
+        writer.transport.set_write_buffer_limits(MAX_BUFFER)
+        writer.write(protocol.hello(dict(self.sim.info(), quantum=self.sim.quantum, max_fps=self.max_fps)))
+        self.clients.add(client)
+        client.wake.set()
+        print(f"{client.name} connected ({len(self.clients)} viewers)")
+        tasks = [asyncio.create_task(self._send(client)), asyncio.create_task(self._receive(client))]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            errors = [t.exception() for t in done]
+            reason = next((e for e in errors if e), None)
+        finally:
+            self.clients.discard(client)
+            writer.close()
+        s = client.stats()
+        why = "timed out" if isinstance(reason, asyncio.TimeoutError) else "disconnected"
+        print(f"{client.name} {why} after {time.perf_counter() - client.connected:.1f}s: "
+              f"{s['frames']} frames, {s['bytes'] / 1e6:.2f} MB, {s['skipped']} skipped")
+
+    def stats(self):
+        return [c.stats() for c in sorted(self.clients, key=lambda c: c.name)]
+
+    async def report(self, every):
+        while True:
+            await asyncio.sleep(every)
+            rows = self.stats()
+            if not rows:
+                continue
+            print(f"{'viewer':<22} {'fps':>6} {'kB/s':>9} {'rtt p50':>8} {'rtt p95':>8} {'skipped':>8} {'inflight':>8}")
+            for r in rows:
+                p50 = f"{r['rtt_p50']:.1f}ms" if r['rtt_p50'] is not None else "-"
+                p95 = f"{r['rtt_p95']:.1f}ms" if r['rtt_p95'] is not None else "-"
+                print(f"{r['client']:<22} {r['fps']:>6.1f} {r['kB/s']:>9.1f} {p50:>8} {p95:>8} "
+                      f"{r['skipped']:>8} {r['inflight']:>8}")
+
+    async def serve(self, host, port, report_every=5.0):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"serving {self.sim.info()['model']} on {host}:{port}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run_clock(),
+                                 *([self.report(report_every)] if report_every else []))
+
+
+def make_sim(model, scene=None, integrator='euler'):
+    """TychoSim or NBodySim for a model, from a scene file if given."""
+    if model == "tycho":
+        if scene:
+            return TychoSim(*scenes.build_tycho(scenes.load(scene)))
+        return TychoSim(*tycho.solar_system())
+    if scene:
+        return NBodySim(*scenes.build_nbody(scenes.load(scene)), integrator)
+    return NBodySim(list(nbody.SOLAR_SYSTEM_NAMES), nbody.solar_system(), integrator)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one simulation and stream it to viewer.py clients")
+    parser.add_argument("--model", choices=["tycho", "nbody"], default="tycho")
+    parser.add_argument("--scene", help="build the bodies from this scene file (see scenes.py)")
+    parser.add_argument("--integrator", choices=list(INTEGRATORS), default="euler", help="nbody integrator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timescale", type=float, default=1.0)
+    parser.add_argument("--max-fps", type=float, default=TICK_RATE, help="frames per second any viewer gets, at most")
+    parser.add_argument("--window", type=int, default=WINDOW, help="unacknowledged frames per viewer, at most")
+    parser.add_argument("--compress", type=int, default=1, choices=range(10),
+                        help="zlib level of difference frames, 0 for none (less CPU, more bandwidth)")
+    parser.add_argument("--stats", type=float, default=5.0, help="seconds between metrics reports (0: none)")
+    args = parser.parse_args()
+    model = scenes.load(args.scene)["model"] if args.scene else args.model
+    server = SimServer(make_sim(model, args.scene, args.integrator), args.timescale,
+                       max_fps=args.max_fps, window=args.window, compress=args.compress)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.stats))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# ===========================================
+# - Snapshots of the whole simulation state (bodies and trails) as .npz
+# - Checkpointer writes them on an interval from a background thread
+#
+#   python main.py --checkpoint tycho.npz
+#   python old.py --checkpoint nbody.npz --interval 30
+# ===========================================
+
+import os
+import threading
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def _fill(buffer, points, appended):
+    # put saved points back into a TrailBuffer, keeping its appended count
+    buffer.clear()
+    if len(points):
+        buffer.extend(points)
+    buffer.appended = int(appended)
+
+
+def tycho_state(system):
+    """Arrays describing a tycho.BodySystem and its bodies' trails."""
+    n = system.n
+    trails = [b.trail for b in system.bodies]
+    return {
+        'model': np.array('tycho'),
+        'init_angle': system.init_angle[:n].copy(),
+        'elapsed': system.elapsed[:n].copy(),
+        'speed': system.speed[:n].copy(),
+        'dist': system.dist[:n].copy(),
+        'kind': system.kind[:n].copy(),
+        'sun_dist': np.array(system.sun_dist, dtype=float),
+        'moon_dist': np.array(system.moon_dist, dtype=float),
+        'trail_points': np.concatenate([t.points() for t in trails]) if trails else np.zeros((0, 2)),
+        'trail_lengths': np.array([len(t) for t in trails], dtype=np.int64),
+        'trail_appended': np.array([t.appended for t in trails], dtype=np.int64),
+    }
+
+
+def restore_tycho(system, state):
+    """Load tycho_state() arrays into a system built the same way (e.g. tycho.solar_system())."""
+    if str(state['model']) != 'tycho' or len(state['speed']) != system.n:
+        raise ValueError("snapshot doesn't match this system")
+    n = system.n
+    for name in ('init_angle', 'elapsed', 'speed', 'dist', 'kind'):
+        getattr(system, name)[:n] = state[name]
+    if 'sun_dist' in state:  # not in older snapshots
+        system.sun_dist = float(state['sun_dist'])
+        system.moon_dist = float(state['moon_dist'])
+    system.update(0, trails=False)
+    points = np.split(state['trail_points'], np.cumsum(state['trail_lengths'])[:-1])
+    for body, pts, appended in zip(system.bodies, points, state['trail_appended']):
+        _fill(body.trail, pts, appended)
+
+
+def nbody_state(planets):
+    """Arrays describing a list of nbody.Planet, orbit histories included."""
+    levels = [level for p in planets for level in p.orbit.levels]
+    return {
+        'model': np.array('nbody'),
+        'pos': np.array([(p.x, p.y) for p in planets], dtype=float),
+        'vel': np.array([(p.x_vel, p.y_vel) for p in planets], dtype=float),
+        'mass': np.array([p.mass for p in planets], dtype=float),
+        'time': np.array([p.time for p in planets], dtype=float),
+        'distance_to_sun': np.array([p.distance_to_sun for p in planets], dtype=float),
+        'orbit_count': np.array([p.orbit.count for p in planets], dtype=np.int64),
+        'orbit_points': np.concatenate([level.points() for level in levels]) if levels else np.zeros((0, 3)),
+        'orbit_lengths': np.array([[len(level) for level in p.orbit.levels] for p in planets], dtype=np.int64),
+        'orbit_appended': np.array([[level.appended for level in p.orbit.levels] for p in planets], dtype=np.int64),
+    }
+
+
+def restore_nbody(planets, state):
+    """Load nbody_state() arrays into planets built the same way (e.g. nbody.solar_system())."""
+    if str(state['model']) != 'nbody' or len(state['mass']) != len(planets):
+        raise ValueError("snapshot doesn't match these planets")
+    lengths = state['orbit_lengths']
+    points = np.split(state['orbit_points'], np.cumsum(lengths.ravel())[:-1])
+    for i, p in enumerate(planets):
+        p.x, p.y = state['pos'][i].tolist()
+        p.x_vel, p.y_vel = state['vel'][i].tolist()
+        p.mass = float(state['mass'][i])
+        p.time = float(state['time'][i])
+        p.distance_to_sun = float(state['distance_to_sun'][i])
+        p.orbit.count = int(state['orbit_count'][i])
+        for j, level in enumerate(p.orbit.levels):
+            if j < lengths.shape[1]:
+                _fill(level, points[i * lengths.shape[1] + j], state['orbit_appended'][i, j])
+            else:
+                level.clear()
+
+
+def save(path, state):
+    """Write a state dict to path atomically (a crash never leaves half a file)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, format_version=FORMAT_VERSION, saved_at=time.time(), **state)
+    os.replace(tmp, path)
+
+
+def load(path):
+    with np.load(path) as data:
+        if int(data['format_version']) != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported snapshot version {int(data['format_version'])}")
+        return {key: data[key] for key in data.files}
+
+
+class Checkpointer:
+    """Saves snapshots every `interval` wall seconds without stalling the loop.
+
+    The state is copied on the calling thread (a few arrays, well under a
+    millisecond) and written to disk on a background thread; if the last
+    write hasn't finished yet, the checkpoint is skipped until next frame.
+    """
+
+    def __init__(self, path, interval=60.0):
+        self.path = path
+        self.interval = interval
+        self.last = time.monotonic()
+        self._thread = None
+
+    def maybe_save(self, get_state):
+        # call every frame; get_state() is only called when a save is due
+        now = time.monotonic()
+        if now - self.last < self.interval or (self._thread and self._thread.is_alive()):
+            return False
+        self.last = now
+        self._thread = threading.Thread(target=save, args=(self.path, get_state()), daemon=True)
+        self._thread.start()
+        return True
+
+    def save_now(self, state):
+        # on exit: wait for any write in flight, then write synchronously
+        if self._thread:
+            self._thread.join()
+        save(self.path, state)
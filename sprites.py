@@ -0,0 +1,125 @@
+# ===========================================
+# - Pre-rendered body sprites: each circle is rasterized once and then
+#   blitted, instead of pygame.draw.circle every frame
+# ===========================================
+
+import math
+
+import numpy as np
+import pygame
+import pygame.gfxdraw
+
+
+class SpriteAtlas:
+    """Body sprites keyed on (color, pixel radius, glow, antialias).
+
+    Sizes follow the zoom, so the atlas is emptied whenever the zoom
+    crosses into another bucket (buckets_per_octave of them per doubling)
+    instead of piling up sprites for radii that won't come back, and it
+    never holds more than maxsize sprites. Lookups happen once per body
+    per frame, so it's a plain dict rather than an LRU like TextCache.
+    """
+
+    def __init__(self, buckets_per_octave=4, maxsize=1024):
+        self.buckets_per_octave = buckets_per_octave
+        self.maxsize = maxsize
+        self.bucket = None
+        self._sprites = {}
+
+    def __len__(self):
+        return len(self._sprites)
+
+    def set_zoom(self, scale):
+        bucket = math.floor(math.log2(scale) * self.buckets_per_octave)
+        if bucket != self.bucket:
+            self.bucket = bucket
+            self._sprites.clear()
+
+    def at(self, color, radius, x, y, glow=0, antialias=False):
+        """(sprite, (x, y, w, h) rect) for a circle centred on (x, y), truncated like pygame.draw.circle.
+
+        The sprite is a filled circle as pygame.draw.circle would draw it,
+        plus an optional glow of `glow` pixels.
+        """
+        key = (color, int(radius), glow, antialias)
+        entry = self._sprites.get(key)
+        if entry is None:
+            if len(self._sprites) >= self.maxsize:
+                self._sprites.clear()
+            sprite = _render(tuple(color), *key[1:])
+            entry = self._sprites[key] = (sprite, sprite.get_width() // 2, sprite.get_width())
+        sprite, half, size = entry
+        return sprite, (int(x) - half, int(y) - half, size, size)
+
+    def clear(self):
+        self._sprites.clear()
+
+
+def _render(color, radius, glow, antialias):
+    c = radius + glow
+    if not (glow or antialias):
+        # opaque with a colorkey blits much faster than per-pixel alpha
+        sprite = pygame.Surface((2 * c, 2 * c))
+        key = (255, 0, 255) if color[:3] == (0, 0, 0) else (0, 0, 0)
+        sprite.fill(key)
+        pygame.draw.circle(sprite, color, (c, c), radius)
+        sprite.set_colorkey(key, pygame.RLEACCEL)
+        return sprite.convert() if pygame.display.get_surface() else sprite
+    sprite = pygame.Surface((2 * c + 1, 2 * c + 1), pygame.SRCALPHA)
+    for i in range(glow, 0, -1):  # outermost, faintest ring first
+        pygame.draw.circle(sprite, (*color[:3], 90 * (glow + 1 - i) // (glow + 1)), (c, c), radius + i)
+    if antialias:
+        pygame.gfxdraw.filled_circle(sprite, c, c, radius, color)
+        pygame.gfxdraw.aacircle(sprite, c, c, radius, color)
+    else:
+        pygame.draw.circle(sprite, color, (c, c), radius)
+    return sprite.convert_alpha() if pygame.display.get_surface() else sprite
+
+
+# Shared atlas used by all three simulations
+atlas = SpriteAtlas()
+
+
+class CircleBatch:
+    """Many bodies drawn as atlas sprites, placed with array maths.
+
+    Bodies that look the same (color and pixel radius) share a sprite. The
+    grouping is only redone when the looks change (a zoom), so a frame
+    costs a few array operations per group rather than Python work per
+    body, and everything goes to the screen in one Surface.blits call.
+    """
+
+    def __init__(self, min_radius=1, glow=0, antialias=False):
+        self.min_radius = min_radius  # smaller bodies aren't drawn
+        self.glow = glow
+        self.antialias = antialias
+        self._looks = None
+        self._groups = []
+
+    def draw(self, renderer, colors, radii, centers):
+        """Queue bodies on renderer: colors and pixel radii per body, (n, 2) screen centers."""
+        radii = np.asarray(radii).astype(int)
+        looks = (tuple(colors), radii.tobytes())
+        if looks != self._looks:
+            self._looks = looks
+            groups = {}
+            for i, look in enumerate(zip(colors, radii.tolist())):
+                groups.setdefault(look, []).append(i)
+            self._groups = [(look, np.array(idx)) for look, idx in groups.items() if look[1] >= self.min_radius]
+        centers = np.asarray(centers).astype(int)
+        for (color, r), idx in self._groups:
+            self._queue(renderer, color, r, centers[idx])
+
+    def draw_group(self, renderer, color, radius, centers):
+        """Queue bodies that all look the same (a belt): one color and pixel radius, (n, 2) screen centers."""
+        if int(radius) >= self.min_radius:
+            self._queue(renderer, color, int(radius), np.asarray(centers).astype(int))
+
+    def _queue(self, renderer, color, r, centers):
+        # centers truncated like pygame.draw.circle, then culled against the screen
+        sprite, (x, _, size, _) = atlas.at(color, r, 0, 0, self.glow, self.antialias)
+        topleft = centers + x
+        w, h = renderer.screen.get_size()
+        keep = ((topleft[:, 0] > -size) & (topleft[:, 0] < w) &
+                (topleft[:, 1] > -size) & (topleft[:, 1] < h))
+        renderer.blit_many(sprite, topleft[keep])
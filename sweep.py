@@ -0,0 +1,215 @@
+# ===========================================
+# - Parameter sweeps: every combination of a grid of model parameters,
+#   run headless on all cores and summarized in one table
+#
+#   python sweep.py tycho --steps 200000 --set SUN_DIST=400,500,600 --set Mars.speed=1.5,1.8,2.1
+#   python sweep.py nbody --steps 20000 --set dt=86400,172800 --set Jupiter.mass=1.898e27,1e28 --csv sweep.csv
+#
+# tycho parameters: SUN_DIST, <Body>.speed, <Body>.dist, <Body>.init_angle (degrees)
+# nbody parameters: dt (seconds), integrator, <Body>.mass (kg)
+# ===========================================
+
+import argparse
+import csv
+import itertools
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import nbody
+import tycho
+from integrators import INTEGRATORS, get_integrator, total_energy
+
+CHUNK = 4096  # steps summarized at once, so memory stays flat however long the run
+
+
+class Metrics:
+    """Closest approach and retrograde loops, accumulated a chunk of steps at a time.
+
+    Closest approach is between any two planets (Earth included). Retrograde
+    is judged from Earth: a planet's apparent longitude moving against the
+    sun's apparent motion, and every switch into it starts a loop.
+    """
+
+    def __init__(self, names, earth, sun, planets):
+        self.names = names
+        self.earth = earth
+        self.sun = sun
+        self.planets = planets  # body indices, Earth not among them
+        self.closest = math.inf
+        self.pair = ""
+        self.loops = np.zeros(len(planets), dtype=np.int64)
+        self._pairs = np.array(list(itertools.combinations(planets + [earth], 2)))
+        self._lon = None
+        self._retro = np.zeros(len(planets), dtype=bool)
+
+    def add(self, pos):
+        """Fold in (T, n, 2) positions of T consecutive steps."""
+        d = pos[:, self._pairs[:, 0]] - pos[:, self._pairs[:, 1]]
+        dist = np.hypot(d[..., 0], d[..., 1]).min(axis=0)
+        k = int(dist.argmin())
+        if dist[k] < self.closest:
+            self.closest = float(dist[k])
+            self.pair = "-".join(self.names[i] for i in self._pairs[k])
+        # apparent longitudes, continuing from the last step of the previous chunk
+        rel = pos - pos[:, self.earth, np.newaxis]
+        lon = np.arctan2(rel[..., 1], rel[..., 0])
+        if self._lon is not None:
+            lon = np.concatenate([self._lon[np.newaxis], lon])
+        self._lon = lon[-1]
+        dlon = (np.diff(lon, axis=0) + np.pi) % (2 * np.pi) - np.pi
+        if not len(dlon):
+            return
+        retro = dlon[:, self.planets] * dlon[:, self.sun, np.newaxis] < 0
+        before = np.concatenate([self._retro[np.newaxis], retro[:-1]])
+        self.loops += (retro & ~before).sum(axis=0)
+        self._retro = retro[-1]
+
+    def summary(self):
+        row = {"closest": self.closest, "pair": self.pair, "loops": int(self.loops.sum())}
+        row.update({f"{self.names[i]} loops": int(n) for i, n in zip(self.planets, self.loops)})
+        return row
+
+
+def run_tycho(params, steps, dt=1 / 60):
+    """Summary metrics for the geocentric model with the given parameters."""
+    system, bodies = tycho.solar_system()
+    by_label = {b.label: b for b in bodies}
+    for key, value in params.items():
+        if key == "SUN_DIST":
+            system.sun_dist = float(value)
+            continue
+        label, _, attr = key.partition(".")
+        if label not in by_label or attr not in ("speed", "dist", "init_angle"):
+            raise ValueError(f"unknown tycho parameter {key!r}")
+        if attr == "init_angle":
+            by_label[label].angle = math.radians(float(value))
+        else:
+            setattr(by_label[label], attr, float(value))
+    # Earth sits at the origin of the model, so it's added as a last body
+    names = [b.label for b in bodies] + ["Earth"]
+    metrics = Metrics(names, len(bodies), names.index("Sun"),
+                      [i for i, b in enumerate(bodies) if b.kind == "planet"])
+    for start in range(0, steps, CHUNK):
+        t = dt * np.arange(start + 1, min(start + CHUNK, steps) + 1)
+        pos = system.positions_at(t)
+        metrics.add(np.concatenate([pos, np.zeros((len(t), 1, 2))], axis=1))
+    return dict(metrics.summary(), drift=float("nan"))
+
+
+def run_nbody(params, steps):
+    """Summary metrics (plus max relative energy drift) for the N-body model."""
+    planets = nbody.solar_system()
+    names = list(nbody.SOLAR_SYSTEM_NAMES)
+    for key, value in params.items():
+        if key in ("dt", "integrator"):
+            continue
+        label, _, attr = key.partition(".")
+        if label not in names or attr != "mass":
+            raise ValueError(f"unknown nbody parameter {key!r}")
+        planets[names.index(label)].mass = float(value)
+    pos, vel, mass = nbody.state_arrays(planets)
+    G = planets[0].G
+    dt = float(params.get("dt", nbody.Planet.TIMESTEP))
+    integrator = get_integrator(params.get("integrator", "euler"))
+    metrics = Metrics(names, names.index("Earth"), names.index("Sun"),
+                      [i for i, name in enumerate(names) if name not in ("Earth", "Sun")])
+    e0 = total_energy(pos, vel, mass, G)
+    drift = 0.0
+    chunk = np.empty((CHUNK, len(planets), 2))
+    for i in range(steps):
+        pos, vel = integrator(pos, vel, dt, lambda p: nbody.accelerations(p, mass, G))
+        chunk[i % CHUNK] = pos
+        if i % 16 == 0 or i == steps - 1:
+            drift = max(drift, abs((total_energy(pos, vel, mass, G) - e0) / e0))
+        if i % CHUNK == CHUNK - 1 or i == steps - 1:
+            metrics.add(chunk[:i % CHUNK + 1])
+    return dict(metrics.summary(), drift=drift)
+
+
+RUNNERS = {"tycho": run_tycho, "nbody": run_nbody}
+
+
+def grid(settings):
+    """Every combination of "name=v1,v2,..." settings, as a list of dicts."""
+    names, choices = [], []
+    for setting in settings:
+        name, _, values = setting.partition("=")
+        names.append(name)
+        choices.append([_value(v) for v in values.split(",")])
+    return [dict(zip(names, combo)) for combo in itertools.product(*choices)]
+
+
+def _value(text):
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def sweep(model, variants, steps, workers=None, progress=None):
+    """Run every variant on a process pool; rows come back in variant order.
+
+    progress(done, total), if given, is called as each variant finishes.
+    """
+    run = RUNNERS[model]
+    rows = [None] * len(variants)
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(run, params, steps): i for i, params in enumerate(variants)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            rows[i] = dict(variants[i], **future.result())
+            if progress:
+                progress(done, len(variants))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a grid of model variants headless on every core")
+    parser.add_argument("model", choices=list(RUNNERS))
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="parameter values to sweep (repeat for more parameters)")
+    parser.add_argument("--steps", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--csv", help="also write the table to this file")
+    args = parser.parse_args()
+    for setting in args.set:
+        if setting.startswith("integrator=") and not set(setting[11:].split(",")) <= set(INTEGRATORS):
+            parser.error(f"integrator must be one of {', '.join(INTEGRATORS)}")
+
+    variants = grid(args.set)
+    start = time.perf_counter()
+
+    def progress(done, total):
+        elapsed = time.perf_counter() - start
+        sys.stderr.write(f"\r{done}/{total} variants, {elapsed:.1f}s elapsed, "
+                         f"~{elapsed / done * (total - done):.0f}s left ")
+        sys.stderr.flush()
+
+    rows = sweep(args.model, variants, args.steps, args.workers, progress)
+    sys.stderr.write("\n")
+    units = (tycho if args.model == "tycho" else nbody).UNITS["length"]
+    print(f"{len(rows)} variants of {args.steps} steps on {args.workers} workers "
+          f"in {time.perf_counter() - start:.1f}s (closest approach in {units})")
+    columns = list(rows[0])
+    widths = [max(len(c), 10) for c in columns]
+    print("  ".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(f"{_cell(row[c]):>{w}}" for c, w in zip(columns, widths)))
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def _cell(value):
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+if __name__ == "__main__":
+    main()
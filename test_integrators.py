@@ -0,0 +1,38 @@
+# ===========================================
+# - Checks that the adaptive integrator fails instead of looping forever
+#   on states it can't step (NaN positions, errors no sub-step can meet)
+#
+#   python -m pytest test_integrators.py
+# ===========================================
+
+import numpy as np
+import pytest
+
+import nbody
+from integrators import RK45
+
+
+def gravity(mass, G=nbody.Planet.G):
+    return lambda p: nbody.accelerations(p, mass, G)
+
+
+def test_rk45_steps_the_solar_system():
+    pos, vel, mass = nbody.state_arrays(nbody.solar_system())
+    rk45 = RK45()
+    new_pos, _ = rk45(pos, vel, nbody.Planet.TIMESTEP, gravity(mass))
+    assert np.isfinite(new_pos).all() and rk45.substeps >= 1
+
+
+def test_rk45_nan_position_raises():
+    pos, vel, mass = nbody.state_arrays(nbody.solar_system())
+    pos[3, 0] = np.nan
+    with pytest.raises(FloatingPointError):
+        RK45()(pos, vel, nbody.Planet.TIMESTEP, gravity(mass))
+
+
+def test_rk45_step_underflow_raises():
+    # accelerations that are noise of huge size: no sub-step is accurate enough
+    rng = np.random.default_rng(0)
+    pos = vel = np.zeros((2, 2))
+    with pytest.raises(RuntimeError):
+        RK45()(pos, vel, 1.0, lambda p: 1e30 * rng.standard_normal(p.shape))
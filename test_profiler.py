@@ -0,0 +1,32 @@
+# ===========================================
+# - Checks that a Chrome trace never holds more than max_trace_events
+#   events, whatever their kind
+#
+#   python -m pytest test_profiler.py
+# ===========================================
+
+import json
+
+from profiler import Profiler
+
+
+def test_trace_is_capped(tmp_path):
+    profiler = Profiler(max_trace_events=50)
+    profiler.start_trace()
+    for _ in range(200):
+        with profiler.section("update"):
+            pass
+        profiler.frame()
+    path = profiler.stop_trace(str(tmp_path / "trace.json"))
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    assert len(events) == 50
+    assert {e["name"] for e in events} == {"update", "frame"}
+
+
+def test_frames_alone_are_capped():
+    profiler = Profiler(max_trace_events=10)
+    profiler.start_trace()
+    for _ in range(100):
+        profiler.frame()
+    assert len(profiler._trace) == 10
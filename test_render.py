@@ -0,0 +1,124 @@
+# ===========================================
+# - Checks that the renderer's shortcuts give the same pixels as the
+#   plain path: stamped crowds of sprites (blit_many), the full repaint
+#   past max_dirty rects and trails drawn straight onto the screen
+#
+#   python -m pytest test_render.py
+# ===========================================
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import pytest
+
+import render
+from render import LayeredRenderer
+from sprites import SpriteAtlas
+
+SIZE = (320, 200)
+BG = (36, 36, 36)
+
+
+@pytest.fixture
+def screen():
+    pygame.init()
+    return pygame.Surface(SIZE, 0, 32)
+
+
+def pixels(surface):
+    return pygame.surfarray.array3d(surface)
+
+
+def layers(renderer):
+    # what the screen should show with nothing dynamic on it
+    expected = renderer.background.copy()
+    expected.blit(renderer.trails, (0, 0))
+    return pixels(expected)
+
+
+def crowd(n=3000, seed=0):
+    # top-left points, some of them partly or wholly off screen
+    rng = np.random.default_rng(seed)
+    return np.stack([rng.integers(-4, SIZE[0] + 4, n), rng.integers(-4, SIZE[1] + 4, n)], axis=1)
+
+
+def draw_crowd(screen, sprite, topleft, stamp):
+    renderer = LayeredRenderer(screen, BG)
+    renderer.begin("view")
+    if stamp:
+        renderer.blit_many(sprite, topleft)
+    else:
+        for pos in topleft.tolist():
+            renderer.blit(sprite, pos)
+    renderer.flush()
+    return renderer
+
+
+@pytest.mark.parametrize("radius", [1, 2])
+def test_stamp_matches_blits(screen, radius):
+    sprite, _ = SpriteAtlas().at((200, 180, 90), radius, 0, 0)
+    topleft = crowd()
+    assert len(topleft) >= render.STAMP_MIN and sprite.get_width() * sprite.get_height() <= render.STAMP_MAX_AREA
+    stamped = draw_crowd(screen, sprite, topleft, stamp=True)
+    got = pixels(screen)
+    dirty = stamped._dirty
+    plain = pygame.Surface(SIZE, 0, 32)
+    draw_crowd(plain, sprite, topleft, stamp=False)
+    assert np.array_equal(got, pixels(plain))
+    # the dirty rects cover every changed pixel
+    changed = np.argwhere((got != BG).any(axis=2))
+    covered = np.zeros(SIZE, dtype=bool)
+    for rect in dirty:
+        covered[rect.left:rect.right, rect.top:rect.bottom] = True
+    assert covered[changed[:, 0], changed[:, 1]].all()
+
+
+def test_stamp_skipped_below_threshold(screen):
+    sprite, _ = SpriteAtlas().at((200, 180, 90), 1, 0, 0)
+    renderer = LayeredRenderer(screen, BG)
+    renderer.begin("view")
+    renderer.blit_many(sprite, crowd(render.STAMP_MIN - 1))
+    assert len(renderer._batch) == render.STAMP_MIN - 1
+
+
+class Owner:
+    # draw_trail keys what it has drawn on weakly referenceable owners
+    pass
+
+
+def draw_frame(renderer, trail, sprites):
+    renderer.begin("view")
+    renderer.draw_trail(Owner(), (90, 200, 120), len(trail), lambda sl: trail[sl], 1.0, (0, 0))
+    for pos in sprites:
+        renderer.mark(pygame.draw.rect(renderer.screen, (255, 255, 255), (*pos, 3, 3)))
+
+
+@pytest.mark.parametrize("max_dirty", [10, 2000])
+def test_repaint_paths_agree(screen, max_dirty):
+    # the full repaint past max_dirty rects and the rect-by-rect erase
+    # both leave exactly the layers on screen
+    t = np.linspace(0, 6, 400)
+    trail = np.stack([160 + 120 * np.cos(t), 100 + 80 * np.sin(t)], axis=1)
+    renderer = LayeredRenderer(screen, BG, max_dirty=max_dirty)
+    draw_frame(renderer, trail[:200], crowd(50, seed=1).clip(0))
+    renderer.begin("view")
+    assert renderer._flip == (max_dirty == 10)
+    assert np.array_equal(pixels(screen), layers(renderer))
+
+
+def test_trail_on_screen_matches_layer(screen):
+    # trails are drawn on the screen as well as the layer, instead of
+    # blitting the layer over them; the screen must match the layers
+    t = np.linspace(0, 12, 2000)
+    trail = np.stack([160 + 140 * np.cos(t) * t / 12, 100 + 90 * np.sin(t) * t / 12], axis=1)
+    renderer = LayeredRenderer(screen, BG)
+    owner = Owner()
+    renderer.begin("view")
+    renderer.draw_trail(owner, (90, 200, 120), 1000, lambda sl: trail[sl], 1.0, (0, 0))
+    assert np.array_equal(pixels(screen), layers(renderer))
+    renderer.begin("view")  # the next 1000 points, drawn incrementally
+    renderer.draw_trail(owner, (90, 200, 120), 2000, lambda sl: trail[sl], 1.0, (0, 0))
+    assert np.array_equal(pixels(screen), layers(renderer))
@@ -0,0 +1,56 @@
+# ===========================================
+# - Checks trail.OrbitHistory's retention: bounded points, sparser older
+#   levels and the max_span time limit
+#
+#   python -m pytest test_trail.py
+# ===========================================
+
+import numpy as np
+
+from trail import OrbitHistory
+
+
+def circle(n):
+    t = np.arange(n, dtype=float)
+    return np.stack([np.cos(t / 10), np.sin(t / 10)], axis=1), t
+
+
+def times(history):
+    return np.concatenate([level.points()[:, 2] for level in reversed(history.levels)])
+
+
+def test_points_stay_bounded():
+    points, t = circle(10000)
+    history = OrbitHistory(max_points=30, levels=3, factor=4)
+    history.extend(points, t)
+    assert len(history) == 90
+    kept = times(history)
+    assert np.all(np.diff(kept) > 0)  # oldest first, no repeats
+    # the newest level is in full, each older one 4x sparser
+    assert np.array_equal(np.diff(history.levels[0].points()[:, 2]), np.ones(29))
+    assert np.all(np.diff(history.levels[1].points()[:, 2]) == 4)
+    assert np.all(np.diff(history.levels[2].points()[:, 2]) == 16)
+
+
+def test_max_span_drops_old_points():
+    points, t = circle(1000)
+    spanned = OrbitHistory(max_points=30, levels=3, factor=4, max_span=50)
+    spanned.extend(points, t)
+    kept = times(spanned)
+    assert kept.min() >= t[-1] - 50
+    assert kept.max() == t[-1]
+    unlimited = OrbitHistory(max_points=30, levels=3, factor=4)
+    unlimited.extend(points, t)
+    assert len(spanned) < len(unlimited)
+    assert times(unlimited).min() < t[-1] - 50
+
+
+def test_max_span_extend_matches_append():
+    points, t = circle(500)
+    a = OrbitHistory(max_points=20, levels=2, factor=2, max_span=40)
+    b = OrbitHistory(max_points=20, levels=2, factor=2, max_span=40)
+    a.extend(points, t)
+    for p, ti in zip(points, t):
+        b.append(p, ti)
+    assert np.array_equal(a.points(), b.points())
+    assert np.array_equal(times(a), times(b))
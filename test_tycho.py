@@ -0,0 +1,56 @@
+# ===========================================
+# - Checks tycho.BodySystem's in-place closed form against the plain
+#   per-body formula: sun and moon circle Earth, planets circle the sun
+#
+#   python -m pytest test_tycho.py
+# ===========================================
+
+import math
+
+import numpy as np
+import pytest
+
+import tycho
+
+
+def reference(system, t):
+    # (n, 2) positions at time t, one body at a time
+    n = system.n
+    sun = next(i for i in range(n) if system.kind[i] == tycho.KIND_SUN)
+    out = np.zeros((n, 2))
+    for i in range(n):
+        a = system.init_angle[i] + system.speed[i] * t
+        r = {tycho.KIND_SUN: system.sun_dist, tycho.KIND_MOON: system.moon_dist}.get(system.kind[i], system.dist[i])
+        out[i] = r * math.cos(a), r * math.sin(a)
+    a = system.init_angle[sun] + system.speed[sun] * t
+    for i in range(n):
+        if system.kind[i] == tycho.KIND_PLANET:
+            out[i] += system.sun_dist * math.cos(a), system.sun_dist * math.sin(a)
+    return out
+
+
+@pytest.fixture
+def system():
+    system, _ = tycho.solar_system()
+    rng = np.random.default_rng(0)
+    system.add_many(rng.uniform(1.3, 1.7, 500), rng.uniform(0, 2 * math.pi, 500), rng.uniform(225, 255, 500))
+    return system
+
+
+def test_positions_at_matches_reference(system):
+    times = [0.0, 1.5, 1234.25]
+    many = system.positions_at(times)
+    for t, got in zip(times, many):
+        assert np.allclose(got, reference(system, t), rtol=0, atol=1e-9)
+        assert np.allclose(system.positions_at(t), reference(system, t), rtol=0, atol=1e-9)
+
+
+def test_update_matches_positions_at(system):
+    system.update(0.75)
+    system.update(2.0)
+    assert np.array_equal(system.world[:system.n], system.positions_at(2.75))
+    # a slice without the sun rides on where the last update put it
+    planets = np.flatnonzero(system.kind[:system.n] == tycho.KIND_PLANET)
+    sl = slice(int(planets[0]), system.n)
+    system.update(0.0, sl, trails=False)
+    assert np.array_equal(system.world[sl], system.positions_at(2.75)[sl])
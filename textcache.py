@@ -0,0 +1,57 @@
+# ===========================================
+# - Cached text rendering for labels and the HUD
+# ===========================================
+
+from collections import OrderedDict
+
+import pygame
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed on (font, text, color, antialias)."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._surfaces = OrderedDict()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            return surf
+        surf = font.render(text, antialias, color)
+        self._surfaces[key] = surf
+        if len(self._surfaces) > self.maxsize:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+
+
+# Shared cache used by all three simulations
+text_cache = TextCache()
+
+
+def render_text(font, text, color, antialias=True):
+    return text_cache.render(font, text, color, antialias)
+
+
+def build_panel(font, lines, antialias=True):
+    """Pre-composite static HUD lines into one surface.
+
+    lines is a list of (text, color, (x, y)) in screen coordinates.
+    Returns (surface, (x, y)) ready to be blitted once per frame.
+    """
+    rendered = [(font.render(text, antialias, color), pos) for text, color, pos in lines]
+    rect = pygame.Rect(rendered[0][1], rendered[0][0].get_size())
+    for surf, pos in rendered[1:]:
+        rect.union_ip(pygame.Rect(pos, surf.get_size()))
+    panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+    for surf, (x, y) in rendered:
+        panel.blit(surf, (x - rect.x, y - rect.y))
+    return panel, rect.topleft
@@ -0,0 +1,135 @@
+# ===========================================
+# - Fixed-capacity trail storage for the simulations
+# ===========================================
+
+import numpy as np
+
+
+class TrailBuffer:
+    """Preallocated float32 ring buffer of (x, y) trail points.
+
+    Every point is written twice, at slot i and i + capacity, so the
+    trail in age order is always one contiguous slice of the storage and
+    points() can hand it out without copying or rebuilding a list.
+    """
+
+    def __init__(self, capacity=300, dtype=np.float32, columns=2):
+        self.capacity = capacity
+        self._data = np.zeros((2 * capacity, columns), dtype=dtype)
+        self._start = 0  # slot of the oldest point
+        self._len = 0
+        self.appended = 0  # points ever appended, never reset
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return iter(self.points())
+
+    def append(self, *row):
+        cap = self.capacity
+        end = (self._start + self._len) % cap
+        self._data[end] = self._data[end + cap] = row
+        self.appended += 1
+        if self._len < cap:
+            self._len += 1
+        else:
+            # full: the new point overwrote the oldest one
+            self._start = (self._start + 1) % cap
+
+    def extend(self, points):
+        """Append many (x, y) points at once, oldest first."""
+        points = np.asarray(points, dtype=self._data.dtype)
+        count = len(points)
+        points = points[-self.capacity:]
+        cap = self.capacity
+        slots = (self._start + self._len + np.arange(len(points))) % cap
+        self._data[slots] = points
+        self._data[slots + cap] = points
+        overflow = max(0, self._len + len(points) - cap)
+        self._start = (self._start + overflow) % cap
+        self._len = min(cap, self._len + len(points))
+        self.appended += count
+
+    @property
+    def window(self):
+        # slice of storage holding the trail in age order
+        return slice(self._start, self._start + self._len)
+
+    def points(self):
+        # (len, 2) view, oldest point first; don't hold on to it across appends
+        return self._data[self.window]
+
+    def drop_oldest(self, k):
+        k = min(k, self._len)
+        self._start = (self._start + k) % self.capacity
+        self._len -= k
+
+    def clear(self):
+        # keep appended monotonic so caches keyed on it stay valid
+        self._start = (self._start + self._len) % self.capacity
+        self._len = 0
+
+
+class OrbitHistory:
+    """Bounded orbit history for old.py and practice.py.
+
+    levels[0] keeps the newest max_points points at full resolution. With
+    more levels, every factor-th point leaving a level moves on to the next
+    one, so each level reaches factor times further back at 1/factor the
+    density, and memory and draw cost stay flat however long the session
+    runs. Points older than max_span (in simulated time) are dropped.
+    """
+
+    def __init__(self, max_points=2000, levels=1, factor=4, max_span=None):
+        # float64 (x, y, t) rows: meters need more precision than trails
+        self.levels = [TrailBuffer(max_points, np.float64, 3) for _ in range(levels)]
+        self.factor = factor
+        self.max_span = max_span
+        self.count = 0  # points ever appended
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    @property
+    def latest(self):
+        # newest (x, y)
+        x, y, _ = self.levels[0].points()[-1]
+        return float(x), float(y)
+
+    def _push(self, i, x, y, t):
+        level = self.levels[i]
+        if len(level) == level.capacity:
+            # the oldest point is about to be overwritten; every factor-th moves down a level
+            if i + 1 < len(self.levels) and (level.appended - len(level)) % self.factor == 0:
+                self._push(i + 1, *level.points()[0])
+        level.append(x, y, t)
+
+    def append(self, point, t=None):
+        """Record (x, y) at simulated time t (default: the point's index)."""
+        t = self.count if t is None else t
+        self._push(0, point[0], point[1], t)
+        self.count += 1
+        if self.max_span is not None:
+            for level in self.levels:
+                level.drop_oldest(int(np.searchsorted(level.points()[:, 2], t - self.max_span)))
+
+    def extend(self, points, times=None):
+        points = np.asarray(points, dtype=float)
+        if times is None:
+            times = self.count + np.arange(len(points))
+        if self.max_span is None and len(self.levels[0]) + len(points) <= self.levels[0].capacity:
+            # nothing overflows, so nothing moves down a level
+            self.levels[0].extend(np.column_stack([points, times]))
+            self.count += len(points)
+            return
+        for p, t in zip(points, times):
+            self.append(p, t)
+
+    def points(self):
+        """Every kept (x, y), oldest first (a copy)."""
+        return np.concatenate([level.points()[:, :2] for level in reversed(self.levels)])
+
+    def clear(self):
+        for level in self.levels:
+            level.clear()
@@ -0,0 +1,281 @@
+# ===========================================
+# - Tycho Brahe's geocentric model: kinematics only
+# - No pygame here, so it can run headless (see headless.py)
+# ===========================================
+
+import math
+
+import numpy as np
+
+from trail import TrailBuffer
+
+# Colors of the bodies
+COLOR_SUN     = (252, 150,   1)
+COLOR_MOON    = (200, 200, 200)
+COLOR_MERCURY = (169, 169, 169)
+COLOR_VENUS   = ( 80, 200, 120)
+COLOR_MARS    = (188,  39,  50)
+COLOR_JUPITER = (205, 133,  63)
+COLOR_SATURN  = (210, 180, 140)
+
+# Distances (in pixels)
+SUN_DIST        = 500  # Increased: Sun orbits Earth at this radius
+MOON_DIST       = 60   # Moon orbits Earth
+MERCURY_DIST    = 100
+VENUS_DIST      = 150
+MARS_DIST       = 200
+JUPITER_DIST    = 275
+SATURN_DIST     = 325
+
+# Units of the model's time and positions (for recorder.py)
+UNITS = {'time': 'animation s', 'length': 'px'}
+
+# Points kept in each body's trail
+TRAIL_LENGTH    = 300
+
+# Body kinds, stored as small ints in BodySystem.kind
+KIND_SUN, KIND_MOON, KIND_PLANET = 0, 1, 2
+KIND_CODES = {'sun': KIND_SUN, 'moon': KIND_MOON, 'planet': KIND_PLANET}
+KIND_NAMES = {v: k for k, v in KIND_CODES.items()}
+
+
+def _slot(name):
+    # property reading/writing this body's entry in a BodySystem array
+    def get(self):
+        return float(getattr(self.system, name)[self.index])
+
+    def set(self, value):
+        getattr(self.system, name)[self.index] = value
+    return property(get, set)
+
+
+class BodySystem:
+    """Struct-of-arrays storage for every body in the scene.
+
+    angle, speed, dist and kind live in NumPy arrays so the whole system
+    advances in one batched step. Body objects are thin views into a slot.
+    Positions are closed-form in time (angle = init_angle + speed * t), so
+    positions_at() can evaluate any time directly instead of replaying steps.
+    """
+
+    def __init__(self, capacity=16):
+        self.n = 0
+        # radii the sun and moon circle Earth at (module defaults unless a scene sets them)
+        self.sun_dist = SUN_DIST
+        self.moon_dist = MOON_DIST
+        self.init_angle = np.zeros(capacity)
+        self.elapsed = np.zeros(capacity)  # simulated time of each body
+        self.angle = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.dist = np.zeros(capacity)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.world = np.zeros((capacity, 2))
+        self.sun_world = np.zeros(2)  # where update() last put the sun, for slices without it
+        self.bodies = []  # Body views, in slot order
+
+    def _grow(self, extra):
+        need = self.n + extra
+        cap = len(self.angle)
+        if need <= cap:
+            return
+        cap = max(need, cap * 2)
+        for name in ('init_angle', 'elapsed', 'angle', 'speed', 'dist', 'kind', 'world'):
+            old = getattr(self, name)
+            arr = np.zeros((cap,) + old.shape[1:], dtype=old.dtype)
+            arr[:self.n] = old[:self.n]
+            setattr(self, name, arr)
+
+    def add_many(self, speed, init_angle, dist, kind='planet'):
+        """Append array-only bodies (belts, swarms); returns their slice."""
+        speed = np.asarray(speed, dtype=float)
+        k = len(speed)
+        self._grow(k)
+        s = slice(self.n, self.n + k)
+        self.speed[s] = speed
+        self.init_angle[s] = self.angle[s] = init_angle
+        self.elapsed[s] = 0
+        self.dist[s] = dist
+        self.kind[s] = KIND_CODES[kind] if isinstance(kind, str) else kind
+        self.n += k
+        return s
+
+    def add(self, body, speed, init_angle, dist, kind):
+        s = self.add_many([speed], init_angle, dist, kind)
+        body.system = self
+        body.index = s.start
+        self.bodies.append(body)
+        return body
+
+    def orbit_radius(self):
+        # sun and moon circle Earth at fixed radii, planets use their own dist
+        kind = self.kind[:self.n]
+        return np.where(kind == KIND_SUN, self.sun_dist,
+                        np.where(kind == KIND_MOON, self.moon_dist, self.dist[:self.n]))
+
+    def _place(self, angle, r, kind, sun_world):
+        # (..., n) angles -> (..., n, 2) world coords; planets ride on the sun
+        # written in place: with belts of ~100k bodies the temporaries cost
+        # as much as the trig
+        world = np.empty(np.shape(angle) + (2,))
+        x, y = world[..., 0], world[..., 1]
+        np.cos(angle, out=x)
+        x *= r
+        np.sin(angle, out=y)
+        y *= r
+        suns = np.flatnonzero(kind == KIND_SUN)
+        if len(suns):
+            sun_world = world[..., suns[0], :].copy()
+        # planets resolve against the sun in a single broadcast
+        planets = kind == KIND_PLANET
+        np.add(world, np.expand_dims(sun_world, -2), out=world, where=planets[:, np.newaxis])
+        return world
+
+    def update(self, dt, sl=None, trails=True):
+        sl = slice(0, self.n) if sl is None else sl
+        self.elapsed[sl] += dt
+        self.angle[sl] = self.init_angle[sl] + self.speed[sl] * self.elapsed[sl]
+        kind = self.kind[sl]
+        world = self._place(self.angle[sl], self.orbit_radius()[sl], kind, self.sun_world)
+        self.world[sl] = world
+        suns = np.flatnonzero(kind == KIND_SUN)
+        if len(suns):
+            self.sun_world = world[suns[0]].copy()
+        if not trails:
+            return
+        for b in self.bodies:
+            if not sl.start <= b.index < sl.stop:
+                continue
+            b.trail.append(*world[b.index - sl.start])
+
+    def advance(self, dt, steps):
+        """Take `steps` steps of dt at once, every one of them landing in the trails.
+
+        Trails only keep their newest points, so no more intermediate
+        positions are evaluated than the longest trail can hold.
+        """
+        if steps < 1:
+            return
+        keep = min(steps - 1, max((b.trail.capacity for b in self.bodies), default=0))
+        if keep:
+            # only bodies with trails; array-only ones (belts) just move on
+            idx = np.array([b.index for b in self.bodies])
+            t = self.elapsed[idx] + dt * np.arange(steps - keep, steps)[:, np.newaxis]
+            angle = self.init_angle[idx] + self.speed[idx] * t
+            world = self._place(angle, self.orbit_radius()[idx], self.kind[idx], self._sun_at(t[:, :1]))
+            for j, b in enumerate(self.bodies):
+                b.trail.extend(world[:, j])
+        self.update(dt * steps)
+
+    def _sun_at(self, t, velocity=False):
+        # (..., 2) sun position (or velocity) at times (..., 1), for planets
+        # whose sun isn't being placed with them
+        suns = np.flatnonzero(self.kind[:self.n] == KIND_SUN)
+        if not len(suns):
+            return np.zeros(2) if velocity else self.sun_world.copy()
+        s = suns[0]
+        angle = self.init_angle[s] + self.speed[s] * t[..., 0]
+        r = self.sun_dist
+        if velocity:
+            angle, r = angle + np.pi / 2, r * self.speed[s]
+        return r * np.stack([np.cos(angle), np.sin(angle)], axis=-1)
+
+    def positions_at(self, t, index=None):
+        """World positions of every body at time t, straight from the closed form.
+
+        t may be a scalar, giving (n, 2), or an array of T times, giving
+        (T, n, 2). Nothing is stepped, so seeking to any time costs the same.
+        index picks out some slots instead of all n (e.g. the named bodies
+        of a scene without its belts).
+        """
+        idx = slice(0, self.n) if index is None else np.asarray(index)
+        t = np.asarray(t, dtype=float)[..., np.newaxis]
+        angle = self.init_angle[idx] + self.speed[idx] * t
+        return self._place(angle, self.orbit_radius()[idx], self.kind[idx], self._sun_at(t))
+
+    def velocities_at(self, t, index=None):
+        """Velocities matching positions_at(t, index), also straight from the closed form."""
+        idx = slice(0, self.n) if index is None else np.asarray(index)
+        t = np.asarray(t, dtype=float)[..., np.newaxis]
+        angle = self.init_angle[idx] + self.speed[idx] * t
+        # d/dt of r (cos a, sin a) is r a' along the direction a quarter turn on
+        return self._place(angle + np.pi / 2, self.orbit_radius()[idx] * self.speed[idx], self.kind[idx],
+                           self._sun_at(t, velocity=True))
+
+    def year(self):
+        """Model time for one turn of the sun round Earth, or None without a sun."""
+        suns = np.flatnonzero(self.kind[:self.n] == KIND_SUN)
+        return 2 * math.pi / abs(float(self.speed[suns[0]])) if len(suns) else None
+
+    def seek(self, t):
+        # jump every body to time t; old trails no longer connect, so drop them
+        self.elapsed[:self.n] = t
+        self.update(0, trails=False)
+        for b in self.bodies:
+            b.trail.clear()
+
+
+class Body:
+    def __init__(self, label, color, speed, init_angle, radius, dist, kind='planet', system=None,
+                 trail_length=TRAIL_LENGTH):
+        self.label = label
+        self.color = color
+        self.radius = radius
+        self.trail = TrailBuffer(trail_length)
+        # kinematic state lives in the system arrays
+        (system or BodySystem(1)).add(self, speed, init_angle, dist, kind)
+
+    dist = _slot('dist')
+
+    @property
+    def sun_world(self):
+        # sun position in world coords, in this body's system
+        sx, sy = self.system.sun_world
+        return (float(sx), float(sy))
+
+    @property
+    def angle(self):
+        return float(self.system.angle[self.index])
+
+    @angle.setter
+    def angle(self, value):
+        # move the phase so the closed form gives this angle now
+        s, i = self.system, self.index
+        s.init_angle[i] = value - s.speed[i] * s.elapsed[i]
+        s.angle[i] = value
+
+    @property
+    def speed(self):
+        return float(self.system.speed[self.index])
+
+    @speed.setter
+    def speed(self, value):
+        # keep the current angle continuous when the speed changes
+        s, i = self.system, self.index
+        s.speed[i] = value
+        s.init_angle[i] = s.angle[i] - value * s.elapsed[i]
+
+    @property
+    def kind(self):
+        return KIND_NAMES[int(self.system.kind[self.index])]
+
+    @property
+    def world(self):
+        wx, wy = self.system.world[self.index]
+        return (float(wx), float(wy))
+
+    def update(self, dt):
+        # steps only this body; main() advances the whole system at once
+        self.system.update(dt, slice(self.index, self.index + 1))
+
+
+def solar_system(system=None, body_cls=Body):
+    """Create the sun, moon and planets (sun first, planets orbit it)."""
+    system = system or BodySystem()
+    sun     = body_cls("Sun", COLOR_SUN,     0.5,  0.0, 20,    0, kind='sun', system=system)
+    moon    = body_cls("Moon", COLOR_MOON,    2.0,  math.radians(0), 6, 0, kind='moon', system=system)
+    mercury = body_cls("Mercury", COLOR_MERCURY, 3.0,  math.radians(0), 5, MERCURY_DIST, system=system)
+    venus   = body_cls("Venus", COLOR_VENUS,   2.5,  math.radians(45), 7, VENUS_DIST, system=system)
+    mars    = body_cls("Mars", COLOR_MARS,    1.8,  math.radians(90), 6, MARS_DIST, system=system)
+    jupiter = body_cls("Jupiter", COLOR_JUPITER, 1.2,  math.radians(135),12, JUPITER_DIST, system=system)
+    saturn  = body_cls("Saturn", COLOR_SATURN,  0.8,  math.radians(180),10, SATURN_DIST, system=system)
+    return system, [sun, moon, mercury, venus, mars, jupiter, saturn]
@@ -0,0 +1,230 @@
+# ===========================================
+# - Thin viewer for server.py: draws whatever the server says the
+#   bodies' positions are, with no model of its own, so any number of
+#   displays show the same simulation
+# - The connection runs on asyncio in a background thread and keeps the
+#   newest frame; the window draws it at its own frame rate. Pan and
+#   zoom are local to each viewer
+#
+#   python viewer.py --host 127.0.0.1 --port 8765
+#   python viewer.py --headless --seconds 10 --fps 30   (metrics only)
+#   python viewer.py --headless --delay 0.1             (a slow viewer)
+# ===========================================
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+
+import protocol
+
+
+class Feed:
+    """Frames from a server.py; every frame is acknowledged once decoded."""
+
+    def __init__(self, host, port, fps):
+        self.host = host
+        self.port = port
+        self.fps = fps
+        self.info = None
+        self.frames = self.bytes = 0
+        self._reader = self._writer = self._decoder = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        kind, payload = await protocol.read_message(self._reader)
+        if kind != protocol.HELLO:
+            raise ValueError(f"expected a HELLO, got message kind {kind}")
+        self.info = json.loads(payload)
+        self._decoder = protocol.FrameDecoder(self.info["quantum"])
+        self._writer.write(protocol.rate(self.fps))
+        return self.info
+
+    async def next(self):
+        """(seq, model time, (n, 2) world positions) of the next frame."""
+        while True:
+            kind, payload = await protocol.read_message(self._reader)
+            if kind == protocol.FRAME:
+                break
+        seq, t, pos = self._decoder.apply(payload)
+        self.frames += 1
+        self.bytes += protocol.HEADER.size + len(payload)
+        self._writer.write(protocol.ack(seq))
+        return seq, t, pos
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+
+
+async def run_headless(feed, seconds, delay=0.0):
+    """Receive for `seconds`, sleeping `delay` after each frame; returns (frames, bytes, wall seconds, last seq)."""
+    await feed.connect()
+    start = time.perf_counter()
+    seq = None
+    while time.perf_counter() - start < seconds:
+        seq, _, _ = await feed.next()
+        if delay:
+            await asyncio.sleep(delay)
+    feed.close()
+    return feed.frames, feed.bytes, time.perf_counter() - start, seq
+
+
+class Latest:
+    """The newest frame of a Feed, kept up to date from a background thread.
+
+    The feed belongs to that thread's event loop: close() asks the loop to
+    stop reading and close it, rather than touching it from another thread.
+    """
+
+    def __init__(self, feed):
+        self.feed = feed
+        self.frame = None  # (seq, t, positions)
+        self.error = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._loop = self._task = None
+        self._thread = threading.Thread(target=asyncio.run, args=(self._run(),), daemon=True)
+        self._thread.start()
+
+    async def _run(self):
+        self._loop, self._task = asyncio.get_running_loop(), asyncio.current_task()
+        try:
+            await self.feed.connect()
+            self._ready.set()
+            while True:
+                frame = await self.feed.next()
+                with self._lock:
+                    self.frame = frame
+        except asyncio.CancelledError:
+            pass  # close()
+        except Exception as e:  # shown by the window, which keeps running
+            self.error = e
+            self._ready.set()
+        finally:
+            self.feed.close()
+
+    def wait(self, timeout=10):
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"no answer from {self.feed.host}:{self.feed.port}")
+        if self.error:
+            raise self.error
+        return self.feed.info
+
+    def get(self):
+        with self._lock:
+            return self.frame
+
+    def close(self, timeout=5):
+        """Stop reading, close the feed on its own loop and wait for the thread."""
+        if self._thread.is_alive() and self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:  # the loop has just finished by itself
+                pass
+        self._thread.join(timeout)
+
+
+def run_window(feed):
+    import pygame
+
+    from camera import Camera
+    from render import MIN_BODY_PX, LayeredRenderer
+    from sprites import CircleBatch, atlas
+    from textcache import render_text
+    from trail import TrailBuffer
+
+    width, height = 1400, 900
+    color_bg, color_white, color_earth = (36, 36, 36), (255, 255, 255), (107, 147, 214)
+    latest = Latest(feed)
+    info = latest.wait()
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption(f"Viewer: {info['model']} from {feed.host}:{feed.port}")
+    renderer = LayeredRenderer(screen, color_bg)
+    font = pygame.font.SysFont("Trebuchet MS", 20)
+    circles = CircleBatch(MIN_BODY_PX)
+    camera = Camera(width // 2, height // 2)
+    bodies = info["bodies"]
+    slots = np.array([b["slot"] for b in bodies], dtype=int)
+    colors = [tuple(b["color"]) for b in bodies]
+    trails = [TrailBuffer() for _ in bodies]
+    zoom, ox, oy = 1.0, 0, 0
+    show_trails = True
+    clock = pygame.time.Clock()
+    seen = None
+    running = True
+    while running:
+        clock.tick(60)
+        for e in pygame.event.get():
+            if e.type == pygame.QUIT or (e.type == pygame.KEYDOWN and e.key in (pygame.K_x, pygame.K_ESCAPE)):
+                running = False
+            elif e.type == pygame.KEYDOWN and e.key == pygame.K_s:
+                show_trails = not show_trails
+            elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 4:
+                zoom *= 1.1
+            elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 5:
+                zoom *= 0.9
+        keys = pygame.key.get_pressed()
+        ox += 5 * (keys[pygame.K_LEFT] - keys[pygame.K_RIGHT])
+        oy += 5 * (keys[pygame.K_UP] - keys[pygame.K_DOWN])
+
+        frame = latest.get()
+        if frame is None:
+            continue
+        seq, t, world = frame
+        if seq != seen:
+            seen = seq
+            for trail, pos in zip(trails, world[slots]):
+                trail.append(*pos)
+        camera.set_view(info["scale"] * zoom, ox, oy)
+        atlas.set_zoom(zoom)
+        renderer.begin((camera.version, show_trails))
+        for g in info["belts"]:
+            circles.draw_group(renderer, tuple(g["color"]), g["radius"] * zoom,
+                               camera.to_screen(world[g["start"]:g["stop"]]))
+        if info["earth"]:
+            renderer.blit(*atlas.at(color_earth, 15 * zoom, *camera.offset))
+        circles.draw(renderer, colors, [b["radius"] * zoom for b in bodies], camera.to_screen(world[slots]))
+        for b, trail in zip(bodies, trails):
+            if show_trails and len(trail) > 2:
+                oldest = trail.appended - len(trail)
+
+                def points(sl, trail=trail, oldest=oldest):
+                    return trail.points()[sl.start - oldest:sl.stop - oldest]
+                renderer.draw_trail(trail, tuple(b["color"]), trail.appended, points, camera.scale, camera.offset,
+                                    len(trail))
+        for b, (x, y) in zip(bodies, camera.to_screen(world[slots])):
+            renderer.blit(render_text(font, b["label"], color_white), (int(x), int(y)))
+        renderer.flush()
+        status = f"Disconnected: {latest.error}" if latest.error else f"t = {t:.1f}  frame {seq}"
+        renderer.mark(screen.blit(render_text(font, status, color_white), (10, 10)))
+        renderer.mark(screen.blit(render_text(font, f"FPS: {int(clock.get_fps())}", color_white), (10, 40)))
+        renderer.end()
+    latest.close()
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a simulation streamed by server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fps", type=float, default=60, help="frames per second to ask the server for")
+    parser.add_argument("--headless", action="store_true", help="no window: receive for --seconds and report")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--delay", type=float, default=0.0, help="headless: seconds to stall after each frame")
+    args = parser.parse_args()
+    feed = Feed(args.host, args.port, args.fps)
+    if not args.headless:
+        run_window(feed)
+        return
+    frames, nbytes, elapsed, seq = asyncio.run(run_headless(feed, args.seconds, args.delay))
+    print(f"{frames} frames ({frames / elapsed:.1f} fps, up to server frame {seq}), "
+          f"{nbytes / elapsed / 1000:.1f} kB/s, {nbytes / max(frames, 1):.0f} bytes/frame")
+
+
+if __name__ == "__main__":
+    main()